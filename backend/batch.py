@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+"""Command-line utility for batch jobs (imports, job workers) with slim settings."""
+import os
+import sys
+
+
+def main():
+    """Run batch management commands without loading the web stack."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'health_ministry.settings_batch')
+    try:
+        from django.core.management import execute_from_command_line
+    except ImportError as exc:
+        raise ImportError(
+            "Couldn't import Django. Are you sure it's installed and "
+            "available on your PYTHONPATH environment variable? Did you "
+            "forget to activate a virtual environment?"
+        ) from exc
+    execute_from_command_line(sys.argv)
+
+
+if __name__ == '__main__':
+    main()
@@ -44,6 +44,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    # Compression: Brotli when available and accepted, otherwise gzip
+    'django.middleware.gzip.GZipMiddleware',
+    'surveillance.middleware.BrotliMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,9 +84,22 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Read-only copy published after each import (see surveillance.snapshots)
+    'snapshot': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'snapshots' / 'surveillance.sqlite3',
+    },
 }
 
+DATABASE_ROUTERS = ['surveillance.routers.SnapshotRouter']
+
+# Serve the ewars dashboard endpoints from the published snapshot when one exists
+SERVE_FROM_SNAPSHOT = True
+
+# Tests always read the test database, never a published snapshot
+TEST_RUNNER = 'surveillance.testing.TestRunner'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -143,10 +159,24 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
+        # Opt-in compact format: ?format=columnar or Accept: application/vnd.eaarogya.columnar+json
+        'surveillance.renderers.ColumnarJSONRenderer',
+    ],
+    # Per-client rate limits; counters live in the default cache
+    'DEFAULT_THROTTLE_CLASSES': [
+        'rest_framework.throttling.AnonRateThrottle',
+        'rest_framework.throttling.UserRateThrottle',
     ],
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': '120/minute',
+        'user': '600/minute',
+    },
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50
 }
 
 # Time zone for Nepal
 TIME_ZONE = 'Asia/Kathmandu'
+
+# Simplified district boundaries loaded by `manage.py load_district_geometries`
+DISTRICT_GEOJSON_PATH = BASE_DIR / 'surveillance' / 'data' / 'nepal_districts.geojson'
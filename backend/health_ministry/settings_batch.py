@@ -0,0 +1,21 @@
+"""
+Slim Django settings for batch and CLI use (used by `batch.py`).
+
+Imports and job workers only need the ORM and the surveillance models, so
+the admin, auth, sessions, messages, CORS and DRF apps, the middleware and
+the API URLconf are left out. Skipping them keeps them from being imported
+at startup and from being loaded by the system checks.
+
+Use the full settings (`manage.py`) for `migrate` and `runserver`.
+"""
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    'surveillance',
+]
+
+MIDDLEWARE = []
+
+TEMPLATES = []
+
+ROOT_URLCONF = 'health_ministry.urls_batch'
@@ -0,0 +1,7 @@
+"""
+Empty URL configuration for the batch settings.
+
+The batch entry point serves no requests; this keeps the system checks from
+importing the admin and API views.
+"""
+urlpatterns = []
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Disease, District, WeeklySurveillanceData, DistrictCaseData
+from .models import (
+    Disease, District, WeeklySurveillanceData, DistrictCaseData, CaseForecast, Job,
+    QuarantinedRow, SurveillanceRevision
+)
 
 
 @admin.register(Disease)
@@ -37,3 +40,35 @@ class DistrictCaseDataAdmin(admin.ModelAdmin):
     list_filter = ['district', 'surveillance_data__disease']
     search_fields = ['district__name', 'surveillance_data__disease__name']
     ordering = ['-cases']
+
+
+@admin.register(CaseForecast)
+class CaseForecastAdmin(admin.ModelAdmin):
+    list_display = ['disease', 'district', 'year', 'week_number', 'horizon', 'predicted_cases', 'lower_bound', 'upper_bound']
+    list_filter = ['horizon', 'disease']
+    search_fields = ['disease__name', 'district__name']
+    ordering = ['disease__name', 'horizon']
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['task', 'status', 'attempts', 'max_attempts', 'worker', 'created_at', 'finished_at']
+    list_filter = ['status', 'task']
+    search_fields = ['task', 'last_error']
+    ordering = ['-created_at']
+
+
+@admin.register(QuarantinedRow)
+class QuarantinedRowAdmin(admin.ModelAdmin):
+    list_display = ['source_file', 'line_number', 'errors', 'warnings', 'created_at']
+    list_filter = ['source_file']
+    search_fields = ['source_file']
+    ordering = ['-created_at', 'line_number']
+
+
+@admin.register(SurveillanceRevision)
+class SurveillanceRevisionAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'object_id', 'action', 'previous', 'source_file', 'recorded_at']
+    list_filter = ['kind', 'action']
+    search_fields = ['source_file']
+    ordering = ['-recorded_at']
@@ -0,0 +1,43 @@
+"""
+Other spellings of EWARS disease and district names.
+
+EWARS bulletins, boundary files and users spell some names differently. The
+keys are the names used in the EWARS data; search indexes the aliases and the
+boundary loader uses them to match features to existing districts.
+"""
+import re
+
+DISEASE_ALIASES = {
+    'AGE': ['Acute Gastroenteritis', 'Diarrhoea', 'Diarrhea'],
+    'SARI': ['Severe Acute Respiratory Infection', 'Pneumonia'],
+    'Influenza Like Illness': ['ILI', 'Flu', 'Influenza'],
+    'Kala azar': ['Visceral Leishmaniasis', 'Leishmaniasis'],
+    'Enteric Fever': ['Typhoid'],
+    'Dengue': ['Dengue Fever'],
+    'Scrub Typhus': ['Typhus'],
+}
+
+DISTRICT_ALIASES = {
+    'CHITAWAN': ['Chitwan'],
+    'KAVREPALANCHOK': ['Kavre', 'Kabhrepalanchok'],
+    'SINDHUPALCHOK': ['Sindhupalchowk'],
+    'NAWALPARASI EAST': ['Nawalpur'],
+    'TANAHU': ['Tanahun'],
+}
+
+
+def district_key(name):
+    """Comparable form of a district name: upper case, with runs of spaces, '_' and '-' as one space"""
+    return re.sub(r'[\s_-]+', ' ', str(name or '')).strip().upper()
+
+
+def district_lookup(districts):
+    """Map the names and aliases of (id, name) pairs to their ids; names win over aliases"""
+    districts = list(districts)
+    lookup = {}
+    for district_id, name in districts:
+        for alias in DISTRICT_ALIASES.get(name, []):
+            lookup.setdefault(district_key(alias), district_id)
+    for district_id, name in districts:
+        lookup[district_key(name)] = district_id
+    return lookup
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SurveillanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'surveillance'
+
+    def ready(self):
+        # Register background tasks with the job queue
+        from . import tasks  # noqa: F401
@@ -0,0 +1,94 @@
+"""
+Plain executemany() inserts and updates for large imports.
+
+bulk_create() and bulk_update() need a model instance per row and build an
+expression per value (bulk_update a CASE per field and row), which dominates
+the time of a multi-season backfill. These helpers take rows as
+{attname: value} dicts and send one parameterized statement per table,
+preparing only the values the database driver cannot take as they are.
+"""
+from django.db import connections
+from django.utils import timezone
+
+BATCH_SIZE = 5000
+
+# Field types whose Python values database drivers accept unchanged
+PLAIN_TYPES = {
+    'AutoField', 'BigAutoField', 'BigIntegerField', 'BooleanField', 'CharField', 'FloatField',
+    'ForeignKey', 'IntegerField', 'PositiveIntegerField', 'PositiveSmallIntegerField',
+    'SmallIntegerField', 'TextField',
+}
+
+
+def _column_values(field, values, connection):
+    if field.get_internal_type() in PLAIN_TYPES:
+        return values
+    return [field.get_db_prep_save(value, connection) for value in values]
+
+
+def _executemany(connection, sql, columns):
+    params = list(zip(*columns))
+    with connection.cursor() as cursor:
+        for start in range(0, len(params), BATCH_SIZE):
+            cursor.executemany(sql, params[start:start + BATCH_SIZE])
+
+
+def insert_rows(model, rows, using='default'):
+    """
+    Insert rows like bulk_create(); primary keys are not returned.
+
+    Missing fields get their default, and auto_now / auto_now_add fields the
+    time of the call.
+    """
+    if not rows:
+        return
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    now = timezone.now()
+
+    columns = []
+    for field in fields:
+        if any(field.attname in row for row in rows):
+            default = field.get_default()
+            values = [row.get(field.attname, default) for row in rows]
+            columns.append(_column_values(field, values, connection))
+            continue
+
+        # Columns left to their default hold the same value in every row
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            default = now
+        else:
+            default = field.get_default()
+        columns.append(_column_values(field, [default], connection) * len(rows))
+
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    _executemany(connection, sql, columns)
+
+
+def update_rows(model, rows, field_names, using='default'):
+    """Write the given fields of rows identified by their primary key, like bulk_update()"""
+    if not rows:
+        return
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in field_names]
+    pk = model._meta.pk
+
+    columns = [
+        _column_values(field, [row[field.attname] for row in rows], connection)
+        for field in fields + [pk]
+    ]
+
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote(model._meta.db_table),
+        ', '.join(f'{quote(field.column)} = %s' for field in fields),
+        quote(pk.column),
+    )
+    _executemany(connection, sql, columns)
@@ -0,0 +1,83 @@
+"""
+Single-flight request coalescing for the dashboard endpoints.
+
+A push notification makes many app instances open the dashboard at once, and
+every request would recompute the same aggregates. Requests are keyed by view,
+query parameters and dataset version: the first request for a key computes the
+response while identical concurrent requests wait for it, and the result is
+kept in the cache for a short time. Publishing new data changes the dataset
+version, so a cached result never outlives the data it was built from.
+"""
+import hashlib
+import threading
+from functools import wraps
+
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from .snapshots import dataset_version
+
+# Seconds a computed dashboard response is reused for the same dataset version
+COALESCE_CACHE_TIMEOUT = 30
+
+# Longest a request waits for an identical in-flight request before computing itself
+COALESCE_WAIT_TIMEOUT = 10
+
+_lock = threading.Lock()
+_in_flight = {}
+
+
+def _cache_key(name, request, version):
+    params = '&'.join(
+        f'{key}={value}'
+        for key, values in sorted(request.query_params.lists())
+        for value in values
+    )
+    digest = hashlib.sha1(params.encode('utf-8')).hexdigest()
+    return f'coalesced:{name}:{version}:{digest}'
+
+
+def coalesced(name, timeout=COALESCE_CACHE_TIMEOUT):
+    """
+    Share one computation between concurrent identical requests to a view.
+
+    Apply below ``@api_view``. Only successful responses are shared; errors are
+    returned to the request that computed them.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            version = dataset_version()
+            if version is None:
+                return view(request, *args, **kwargs)
+
+            key = _cache_key(name, request, version)
+            cached = cache.get(key)
+            if cached is not None:
+                return Response(cached)
+
+            with _lock:
+                event = _in_flight.get(key)
+                leader = event is None
+                if leader:
+                    event = _in_flight[key] = threading.Event()
+
+            if not leader:
+                event.wait(COALESCE_WAIT_TIMEOUT)
+                cached = cache.get(key)
+                if cached is not None:
+                    return Response(cached)
+                return view(request, *args, **kwargs)
+
+            try:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set(key, response.data, timeout)
+                return response
+            finally:
+                with _lock:
+                    del _in_flight[key]
+                event.set()
+
+        return wrapper
+    return decorator
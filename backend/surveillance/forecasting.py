@@ -0,0 +1,186 @@
+"""
+Short-horizon case forecasting.
+
+Every disease (national) and disease x district series is fitted with simple
+exponential smoothing in one batched NumPy pass: the smoothing parameter is
+chosen per series from a fixed grid by one-step-ahead squared error, and
+prediction intervals widen with the horizon as for the ETS(A,N,N) model.
+Weeks missing from a series (e.g. a district outside the top affected list)
+are skipped rather than treated as zero cases, and each series is forecast
+from its own last reported week.
+"""
+from datetime import date
+
+import numpy as np
+from django.db import transaction
+
+from .models import CaseForecast, DistrictCaseData, WeeklySurveillanceData
+
+FORECAST_HORIZONS = (1, 2, 3, 4)
+
+ALPHA_GRID = np.linspace(0.1, 0.9, 9)
+
+# Series with fewer observed weeks than this are not forecast
+MIN_OBSERVATIONS = 3
+
+# Two-sided 90% normal interval
+INTERVAL_Z = 1.645
+
+METHOD_NAME = 'exponential_smoothing'
+
+
+def weeks_in_year(year):
+    """Number of ISO weeks (52 or 53) in a year"""
+    return date(year, 12, 28).isocalendar()[1]
+
+
+def advance_week(year, week, weeks):
+    """Epidemiological (year, week) reached by moving forward a number of weeks"""
+    for _ in range(weeks):
+        # A reported week 53 is followed by week 1 even in a 52-week year
+        if week >= weeks_in_year(year):
+            year, week = year + 1, 1
+        else:
+            week += 1
+    return year, week
+
+
+def last_observed(values):
+    """Column of the last non-NaN value in every row (rows are assumed non-empty)"""
+    return values.shape[1] - 1 - np.argmax(~np.isnan(values[:, ::-1]), axis=1)
+
+
+def load_series():
+    """
+    Build the observation matrix for all forecastable series.
+
+    Returns (keys, periods, values) where keys holds one (disease_id, district_id)
+    pair per row (district_id is None for the national series), periods holds the
+    ordered (year, week) columns and values is a float array with NaN for gaps.
+    """
+    national = list(WeeklySurveillanceData.objects.filter(
+        current_week_cases__isnull=False
+    ).values_list('disease_id', 'year', 'week_number', 'current_week_cases'))
+
+    district = list(DistrictCaseData.objects.values_list(
+        'surveillance_data__disease_id', 'district_id',
+        'surveillance_data__year', 'surveillance_data__week_number', 'cases'
+    ))
+
+    periods = sorted(
+        {(year, week) for _, year, week, _ in national}
+        | {(year, week) for _, _, year, week, _ in district}
+    )
+    period_index = {period: i for i, period in enumerate(periods)}
+
+    observations = [
+        ((disease_id, None), period_index[(year, week)], cases)
+        for disease_id, year, week, cases in national
+    ] + [
+        ((disease_id, district_id), period_index[(year, week)], cases)
+        for disease_id, district_id, year, week, cases in district
+    ]
+
+    keys = sorted({key for key, _, _ in observations}, key=lambda key: (key[0], key[1] or 0))
+    key_index = {key: i for i, key in enumerate(keys)}
+
+    values = np.full((len(keys), len(periods)), np.nan)
+    if observations:
+        rows = np.fromiter((key_index[key] for key, _, _ in observations), dtype=np.intp)
+        columns = np.fromiter((column for _, column, _ in observations), dtype=np.intp)
+        values[rows, columns] = np.fromiter((cases for _, _, cases in observations), dtype=float)
+
+    return keys, periods, values
+
+
+def fit_exponential_smoothing(values, alphas=ALPHA_GRID):
+    """
+    Fit simple exponential smoothing to every row of values at once.
+
+    Returns (level, alpha, sigma, observed) arrays with one entry per row.
+    """
+    n_series, n_periods = values.shape
+    grid = np.asarray(alphas, dtype=float)[:, None]
+
+    level = np.full((len(grid), n_series), np.nan)
+    sse = np.zeros((len(grid), n_series))
+    observed = np.zeros(n_series, dtype=int)
+
+    for t in range(n_periods):
+        y = values[:, t]
+        valid = ~np.isnan(y)
+        started = valid & ~np.isnan(level[0])
+
+        error = np.where(started, y - level, 0.0)
+        sse += error ** 2
+
+        # The first observation of a series initialises its level
+        level = np.where(valid & np.isnan(level), y, level)
+        level = np.where(started, level + grid * error, level)
+        observed += valid
+
+    # Mean one-step squared error; series with a single observation get no errors
+    errors = np.maximum(observed - 1, 1)
+    best = np.argmin(sse / errors, axis=0)
+    columns = np.arange(n_series)
+
+    best_level = level[best, columns]
+    best_alpha = grid[best, 0]
+    sigma = np.sqrt(sse[best, columns] / errors)
+    # Counts are at least Poisson-noisy; avoid zero-width intervals on flat series
+    sigma = np.maximum(sigma, np.sqrt(np.maximum(best_level, 1.0)))
+
+    return best_level, best_alpha, sigma, observed
+
+
+def forecast_intervals(level, alpha, sigma, horizons=FORECAST_HORIZONS):
+    """Point forecasts and interval bounds, shaped (series, horizon)"""
+    steps = np.asarray(horizons, dtype=float)[None, :]
+    spread = INTERVAL_Z * sigma[:, None] * np.sqrt(1.0 + (steps - 1.0) * alpha[:, None] ** 2)
+    point = np.repeat(level[:, None], len(horizons), axis=1)
+    return point, np.maximum(point - spread, 0.0), point + spread
+
+
+def refit_forecasts():
+    """Refit all series and replace the stored forecasts; returns the number stored"""
+    keys, periods, values = load_series()
+    if not periods:
+        with transaction.atomic():
+            CaseForecast.objects.all().delete()
+        return 0
+
+    level, alpha, sigma, observed = fit_exponential_smoothing(values)
+    point, lower, upper = forecast_intervals(level, alpha, sigma)
+
+    latest_period = periods[-1]
+    origins = last_observed(values)
+
+    forecasts = []
+    for row in np.flatnonzero(observed >= MIN_OBSERVATIONS):
+        # Forecast from the series' own last observation, and skip series last
+        # reported so long ago that every forecast week is already in the past
+        origin_year, origin_week = periods[origins[row]]
+        targets = [advance_week(origin_year, origin_week, h) for h in FORECAST_HORIZONS]
+        if targets[-1] < latest_period:
+            continue
+
+        disease_id, district_id = keys[row]
+        for column, horizon in enumerate(FORECAST_HORIZONS):
+            year, week = targets[column]
+            forecasts.append(CaseForecast(
+                disease_id=disease_id,
+                district_id=district_id,
+                year=year,
+                week_number=week,
+                horizon=horizon,
+                method=METHOD_NAME,
+                predicted_cases=round(float(point[row, column]), 2),
+                lower_bound=round(float(lower[row, column]), 2),
+                upper_bound=round(float(upper[row, column]), 2),
+            ))
+
+    with transaction.atomic():
+        CaseForecast.objects.all().delete()
+        CaseForecast.objects.bulk_create(forecasts, batch_size=1000)
+
+    return len(forecasts)
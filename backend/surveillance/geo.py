@@ -0,0 +1,148 @@
+"""
+District geometry helpers for the heatmap endpoints.
+
+Geometries are simplified and coordinate-quantized once, when they are loaded
+into ``District.geometry``, so the API only ever serves the compact form.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import District
+
+# Default Douglas-Peucker tolerance in degrees (~500 m at Nepal's latitude)
+DEFAULT_TOLERANCE = 0.005
+
+# Decimal places kept for coordinates (~110 m)
+COORDINATE_PRECISION = 3
+
+GEOMETRY_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _perpendicular_distance(point, start, end):
+    """Distance from point to the line through start and end"""
+    (x, y), (x1, y1), (x2, y2) = point, start, end
+    dx, dy = x2 - x1, y2 - y1
+    if dx == 0 and dy == 0:
+        return ((x - x1) ** 2 + (y - y1) ** 2) ** 0.5
+    return abs(dy * x - dx * y + x2 * y1 - y2 * x1) / (dx * dx + dy * dy) ** 0.5
+
+
+def simplify_line(points, tolerance):
+    """Douglas-Peucker simplification of a list of [x, y] points"""
+    if len(points) < 3:
+        return list(points)
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+
+    while stack:
+        first, last = stack.pop()
+        max_distance, index = 0.0, None
+        for i in range(first + 1, last):
+            distance = _perpendicular_distance(points[i], points[first], points[last])
+            if distance > max_distance:
+                max_distance, index = distance, i
+        if index is not None and max_distance > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def _simplify_ring(ring, tolerance, precision):
+    simplified = simplify_line(ring, tolerance)
+    quantized = []
+    for x, y in simplified:
+        point = [round(x, precision), round(y, precision)]
+        if not quantized or quantized[-1] != point:
+            quantized.append(point)
+    # A closed ring needs at least four positions to stay valid
+    if len(quantized) < 4:
+        return None
+    if quantized[0] != quantized[-1]:
+        quantized.append(quantized[0])
+    return quantized
+
+
+def _simplify_polygon(rings, tolerance, precision):
+    simplified = []
+    for index, ring in enumerate(rings):
+        result = _simplify_ring(ring, tolerance, precision)
+        if result is None:
+            if index == 0:
+                # The exterior collapsed; keep a quantized copy rather than drop the district
+                result = [[round(x, precision), round(y, precision)] for x, y in ring]
+            else:
+                continue
+        simplified.append(result)
+    return simplified
+
+
+def simplify_geometry(geometry, tolerance=DEFAULT_TOLERANCE, precision=COORDINATE_PRECISION):
+    """Simplify and quantize a GeoJSON Polygon or MultiPolygon geometry"""
+    geometry_type = geometry.get('type')
+    coordinates = geometry.get('coordinates') or []
+
+    if geometry_type == 'Polygon':
+        return {
+            'type': 'Polygon',
+            'coordinates': _simplify_polygon(coordinates, tolerance, precision),
+        }
+    if geometry_type == 'MultiPolygon':
+        return {
+            'type': 'MultiPolygon',
+            'coordinates': [
+                _simplify_polygon(polygon, tolerance, precision) for polygon in coordinates
+            ],
+        }
+    raise ValueError(f'Unsupported geometry type: {geometry_type}')
+
+
+def geometry_version():
+    """Short identifier that changes whenever any district geometry changes"""
+    stats = District.objects.filter(geometry__isnull=False).aggregate(
+        count=Count('id'), last_updated=Max('updated_at')
+    )
+    raw = f"{stats['count']}:{stats['last_updated'].isoformat() if stats['last_updated'] else ''}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+
+def geometry_payload(version=None):
+    """
+    Compact FeatureCollection of all districts with a geometry.
+
+    Features are ordered by district id; heatmap value arrays use the same order.
+    """
+    version = version or geometry_version()
+    cache_key = f'district-geometry:{version}'
+    payload = cache.get(cache_key)
+    if payload is not None:
+        return payload
+
+    districts = District.objects.filter(geometry__isnull=False).order_by('id').values(
+        'id', 'name', 'province', 'geometry'
+    )
+    payload = {
+        'type': 'FeatureCollection',
+        'version': version,
+        'features': [
+            {
+                'type': 'Feature',
+                'id': district['id'],
+                'properties': {'name': district['name'], 'province': district['province']},
+                'geometry': district['geometry'],
+            }
+            for district in districts
+        ],
+    }
+    cache.set(cache_key, payload, GEOMETRY_CACHE_TIMEOUT)
+    return payload
+
+
+def geometry_district_ids(version=None):
+    """District ids in the order used by the geometry payload"""
+    return [feature['id'] for feature in geometry_payload(version)['features']]
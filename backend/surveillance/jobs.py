@@ -0,0 +1,134 @@
+"""
+Database-backed job queue for work that should not run inside a request or
+the import transaction.
+
+Jobs are rows in the ``Job`` table. Workers (``manage.py run_jobs``) claim a
+pending job with a conditional UPDATE, so several worker threads or processes
+can share the queue without an external broker.
+"""
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import OperationalError
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+# Tasks queued after every successful import
+POST_IMPORT_TASKS = []
+
+# Delay before the first retry; doubles on every further attempt
+RETRY_BACKOFF_SECONDS = 30
+
+# Running jobs not finished after this long are assumed to belong to a dead worker
+STALE_JOB_TIMEOUT = timedelta(hours=1)
+
+# Attempts at recording a job's outcome while another process holds the write lock,
+# waiting this many seconds longer after each one
+SAVE_ATTEMPTS = 5
+SAVE_RETRY_SECONDS = 2
+
+
+def task(name, post_import=False):
+    """Register a function as a job task, optionally queued after each import"""
+    def decorator(func):
+        TASKS[name] = func
+        if post_import:
+            POST_IMPORT_TASKS.append(name)
+        return func
+    return decorator
+
+
+def enqueue(task_name, payload=None, max_attempts=3, run_after=None):
+    """Queue a registered task and return its Job"""
+    if task_name not in TASKS:
+        raise ValueError(f'Unknown task: {task_name}')
+    return Job.objects.create(
+        task=task_name,
+        payload=payload or {},
+        max_attempts=max_attempts,
+        run_after=run_after or timezone.now(),
+    )
+
+
+def enqueue_post_import():
+    """Queue every post-import task; returns the created jobs"""
+    return [enqueue(task_name) for task_name in POST_IMPORT_TASKS]
+
+
+def claim_next(worker):
+    """Atomically mark the next due job as running for this worker; None if idle"""
+    now = timezone.now()
+    candidates = Job.objects.filter(
+        status=Job.STATUS_PENDING, run_after__lte=now
+    ).order_by('run_after', 'id').values_list('id', flat=True)[:10]
+
+    for job_id in candidates:
+        claimed = Job.objects.filter(id=job_id, status=Job.STATUS_PENDING).update(
+            status=Job.STATUS_RUNNING,
+            worker=worker,
+            started_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def run_job(job):
+    """Execute a claimed job and record its outcome"""
+    func = TASKS.get(job.task)
+    try:
+        if func is None:
+            raise ValueError(f'Unknown task: {job.task}')
+        func(**job.payload)
+    except Exception:
+        logger.exception('Job %s (%s) failed', job.pk, job.task)
+        job.last_error = traceback.format_exc()
+        if func is not None and job.attempts < job.max_attempts:
+            job.status = Job.STATUS_PENDING
+            job.run_after = timezone.now() + timedelta(
+                seconds=RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+            )
+        else:
+            job.status = Job.STATUS_FAILED
+            job.finished_at = timezone.now()
+    else:
+        job.status = Job.STATUS_SUCCEEDED
+        job.last_error = None
+        job.finished_at = timezone.now()
+
+    _save_outcome(job)
+    return job
+
+
+def _save_outcome(job):
+    for attempt in range(1, SAVE_ATTEMPTS + 1):
+        try:
+            job.save(update_fields=['status', 'last_error', 'run_after', 'finished_at'])
+            return
+        except OperationalError:
+            # SQLite reports "database is locked" while an import holds the write lock
+            # longer than its busy timeout; the job has run, so only its status is missing
+            if attempt == SAVE_ATTEMPTS:
+                raise
+            logger.warning('Job %s: database busy, retrying the status update', job.pk)
+            time.sleep(SAVE_RETRY_SECONDS * attempt)
+
+
+def requeue_stale_jobs():
+    """Return jobs left running by a crashed worker to the queue (or fail them if out of attempts)"""
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.STATUS_RUNNING, started_at__lt=now - STALE_JOB_TIMEOUT)
+
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.STATUS_FAILED, finished_at=now, last_error='Worker stopped before the job finished'
+    )
+    return stale.update(status=Job.STATUS_PENDING, worker=None)
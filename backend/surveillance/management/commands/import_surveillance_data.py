@@ -1,8 +1,22 @@
 import csv
+import json
+import os
 import re
+import sqlite3
+import time
 from django.core.management.base import BaseCommand
 from django.db import transaction
-from surveillance.models import Disease, District, WeeklySurveillanceData, DistrictCaseData
+from surveillance.jobs import enqueue_post_import
+from surveillance.metrics import refresh_computed_metrics
+from surveillance.revisions import record_deletions, save_revised_bulk
+from surveillance.snapshots import publish_snapshot
+from surveillance.sources import detect_year, discover_files, row_year
+from surveillance.validation import invalid_row_indexes, validate_files
+from surveillance.models import (
+    Disease, District, WeeklySurveillanceData, DistrictCaseData, QuarantinedRow, SurveillanceRevision
+)
+
+DISTRICT_PATTERN = re.compile(r'([A-Z\s]+)\s*\((\d+)\)')
 
 
 class Command(BaseCommand):
@@ -13,140 +27,247 @@ class Command(BaseCommand):
             '--file',
             type=str,
             default='cleaned_disease_surveillance_data.csv',
-            help='Path to the CSV file containing surveillance data'
+            help='Path to a CSV file, or a directory of CSV files (e.g. one subdirectory per year)'
+        )
+        parser.add_argument(
+            '--year',
+            type=int,
+            help='Epidemiological year for files whose name, directory or Year column does not give one'
         )
         parser.add_argument(
             '--clear',
             action='store_true',
             help='Clear existing data before importing'
         )
+        parser.add_argument(
+            '--report',
+            type=str,
+            help='Write the data-quality report as JSON to this path'
+        )
+        parser.add_argument(
+            '--quarantine',
+            action='store_true',
+            help='Store rows failing data-quality checks in the quarantine table instead of importing them'
+        )
+        parser.add_argument(
+            '--validate-only',
+            action='store_true',
+            help='Run the data-quality checks without importing anything'
+        )
 
     def handle(self, *args, **options):
-        csv_file = options['file']
+        csv_path = options['file']
         clear_data = options['clear']
 
-        if clear_data:
-            self.stdout.write('Clearing existing surveillance data...')
-            WeeklySurveillanceData.objects.all().delete()
-            DistrictCaseData.objects.all().delete()
-            self.stdout.write(self.style.SUCCESS('Existing data cleared.'))
-
         try:
-            with open(csv_file, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                
-                with transaction.atomic():
-                    for row in reader:
-                        self.process_row(row)
-                        
-            self.stdout.write(self.style.SUCCESS('Successfully imported surveillance data'))
-            
+            started = time.perf_counter()
+            root = csv_path if os.path.isdir(csv_path) else None
+            files = discover_files(csv_path)
+            if not files:
+                self.stdout.write(self.style.ERROR(f'No CSV files found in {csv_path}'))
+                return
+
+            # Read and check every file before writing anything
+            sources = []
+            for path in files:
+                with open(path, 'r', encoding='utf-8') as file:
+                    rows = list(csv.DictReader(file))
+
+                file_year = detect_year(path, root) or options['year']
+                years = [row_year(row, file_year) for row in rows]
+                if None in years:
+                    self.stdout.write(self.style.ERROR(
+                        f'Cannot tell the year of {path}: name the file or its directory '
+                        f'after the year, add a Year column, or pass --year'
+                    ))
+                    return
+
+                sources.append((str(path), rows, years))
+
+            # One pass over all files, so the same week in two files is compared too
+            reports = validate_files(sources)
+            for report in reports:
+                self.write_report(report)
+
+            if options['report']:
+                self.save_report(reports[0] if len(reports) == 1 else {
+                    'source': csv_path,
+                    'files': reports,
+                }, options['report'])
+            if options['validate_only']:
+                return
+
+            with transaction.atomic():
+                # Cleared in the same transaction, so a failed import keeps the existing data
+                if clear_data:
+                    self.clear_data()
+
+                imported = []
+                for (path, rows, years), report in zip(sources, reports):
+                    invalid_rows = invalid_row_indexes(report) if options['quarantine'] else set()
+                    if invalid_rows:
+                        self.quarantine_rows(path, rows, report)
+                    imported.extend(
+                        (row, year) for index, (row, year) in enumerate(zip(rows, years))
+                        if index not in invalid_rows
+                    )
+
+                self.import_rows(imported)
+
+                # Derive deltas from the stored series instead of trusting the CSV
+                updated = refresh_computed_metrics()
+                self.stdout.write(f'Recomputed change metrics for {updated} rows')
+
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f'Successfully imported {len(imported)} rows from {len(files)} files '
+                f'in {elapsed:.1f}s ({len(imported) / elapsed:,.0f} rows/s)'
+            ))
+
+            # Expensive follow-up work runs in the background (`manage.py run_jobs`)
+            jobs = enqueue_post_import()
+            self.stdout.write(f'Queued post-import jobs: {", ".join(job.task for job in jobs)}')
+
+            # Swap the committed data in for the dashboard endpoints in one step
+            try:
+                snapshot = publish_snapshot()
+            except (OSError, sqlite3.Error) as e:
+                self.stdout.write(self.style.ERROR(
+                    f'Imported, but publishing the read snapshot failed ({str(e)}); '
+                    f'run manage.py publish_snapshot'
+                ))
+            else:
+                if snapshot is not None:
+                    self.stdout.write(f'Published read snapshot: {snapshot}')
+
         except FileNotFoundError:
             self.stdout.write(
-                self.style.ERROR(f'File {csv_file} not found. Please check the file path.')
+                self.style.ERROR(f'File {csv_path} not found. Please check the file path.')
             )
         except Exception as e:
             self.stdout.write(
                 self.style.ERROR(f'Error importing data: {str(e)}')
             )
 
-    def process_row(self, row):
-        """Process a single row of CSV data"""
-        try:
-            # Extract basic information
-            source_file = row['Source_File']
-            week_number = int(row['Week_Number'])
-            disease_name = row['Disease_Syndrome']
-            
-            # Get or create disease
-            disease, created = Disease.objects.get_or_create(
-                name=disease_name,
-                defaults={'description': f'Disease surveillance data for {disease_name}'}
-            )
-            
-            if created:
-                self.stdout.write(f'Created new disease: {disease_name}')
-
-            # Parse case numbers (handle empty strings and non-numeric values)
-            def safe_int(value):
-                if not value or value.strip() == '':
-                    return None
-                try:
-                    return int(value)
-                except (ValueError, TypeError):
-                    return None
-
-            previous_week_cases = safe_int(row['Previous_Week_Cases'])
-            current_week_cases = safe_int(row['Current_Week_Cases'])
-            change_in_cases = safe_int(row['Change_in_Cases'])
-            same_week_last_year = safe_int(row['Same_Week_Last_Year'])
-            year_over_year_change = safe_int(row['Year_over_Year_Change'])
-            
-            trend = row['Trend']
-            top_affected_districts = row['Top_Affected_Districts']
-
-            # Create or update surveillance data
-            surveillance_data, created = WeeklySurveillanceData.objects.update_or_create(
-                week_number=week_number,
-                year=2024,  # Assuming 2024 data
-                disease=disease,
-                defaults={
-                    'source_file': source_file,
-                    'previous_week_cases': previous_week_cases,
-                    'current_week_cases': current_week_cases,
-                    'change_in_cases': change_in_cases,
-                    'same_week_last_year': same_week_last_year,
-                    'year_over_year_change': year_over_year_change,
-                    'trend': trend,
-                    'top_affected_districts': top_affected_districts,
-                }
+    def clear_data(self):
+        """Delete all surveillance data, keeping the cleared values in the revision history"""
+        self.stdout.write('Clearing existing surveillance data...')
+        record_deletions(SurveillanceRevision.KIND_DISTRICT, DistrictCaseData.objects.all())
+        record_deletions(SurveillanceRevision.KIND_WEEKLY, WeeklySurveillanceData.objects.all())
+        WeeklySurveillanceData.objects.all().delete()
+        DistrictCaseData.objects.all().delete()
+        self.stdout.write(self.style.SUCCESS('Existing data cleared.'))
+
+    def write_report(self, report):
+        """Summarize a file's data-quality report"""
+        style = self.style.WARNING if report['invalid_rows'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Data quality of {report['source']}: {report['valid_rows']} of {report['total_rows']} "
+            f"rows passed ({report['invalid_rows']} with errors)"
+        ))
+        for check, count in report['checks'].items():
+            if count:
+                self.stdout.write(f'  {check}: {count} rows')
+
+    def save_report(self, report, report_path):
+        """Save the data-quality report as JSON"""
+        with open(report_path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        self.stdout.write(f'Quality report written to {report_path}')
+
+    def quarantine_rows(self, csv_file, rows, report):
+        """Store rows with data-quality errors instead of importing them"""
+        quarantined = [
+            QuarantinedRow(
+                source_file=csv_file,
+                line_number=issue['line'],
+                data=rows[issue['row']],
+                errors=issue['errors'],
+                warnings=issue['warnings'],
             )
+            for issue in report['issues'] if issue['errors']
+        ]
+        QuarantinedRow.objects.bulk_create(quarantined)
+        self.stdout.write(self.style.WARNING(f'Quarantined {len(quarantined)} rows'))
 
-            if created:
-                self.stdout.write(f'Created surveillance data: Week {week_number} - {disease_name}')
+    def import_rows(self, rows):
+        """Write (row, year) pairs with a few bulk queries per table"""
+        diseases = self.get_or_create_named(Disease, {row['Disease_Syndrome'] for row, _ in rows}, {
+            'description': lambda name: f'Disease surveillance data for {name}',
+        })
 
-            # Process district-specific data
-            self.process_district_data(surveillance_data, top_affected_districts)
+        weekly, district_cases = [], []
+        for row, year in rows:
+            try:
+                week_number = int(row['Week_Number'])
+            except (ValueError, TypeError) as e:
+                self.stdout.write(self.style.WARNING(f'Error processing row: {str(e)}'))
+                continue
 
-        except Exception as e:
-            self.stdout.write(
-                self.style.WARNING(f'Error processing row: {str(e)}')
+            source_file = row['Source_File']
+            key = (diseases[row['Disease_Syndrome']], week_number, year)
+            weekly.append((key, self.parse_row(row), source_file))
+            district_cases.extend(
+                (key, district_name, cases, source_file)
+                for district_name, cases in self.parse_district_data(row['Top_Affected_Districts'])
             )
 
-    def process_district_data(self, surveillance_data, districts_data):
-        """Extract and store district-specific case data"""
-        if not districts_data or districts_data.strip() == '':
-            return
+        # Create or update surveillance data, keeping earlier values in the revision log
+        weekly_ids, created, updated = save_revised_bulk(SurveillanceRevision.KIND_WEEKLY, weekly)
+        self.stdout.write(f'Surveillance data: {created} created, {updated} updated')
 
-        # Parse district data - format like "KATHMANDU (52), KAILALI (44), PARSA (39)"
-        district_pattern = r'([A-Z\s]+)\s*\((\d+)\)'
-        matches = re.findall(district_pattern, districts_data)
+        districts = self.get_or_create_named(District, {name for _, name, _, _ in district_cases}, {
+            'province': lambda name: 'Unknown',  # We can update this later with proper province data
+        })
+        _, created, updated = save_revised_bulk(SurveillanceRevision.KIND_DISTRICT, [
+            ((weekly_ids[key], districts[district_name]), {'cases': cases}, source_file)
+            for key, district_name, cases, source_file in district_cases
+        ])
+        self.stdout.write(f'District case data: {created} created, {updated} updated')
+
+    def get_or_create_named(self, model, names, defaults):
+        """Ids by name for a model with a unique name, creating the missing ones"""
+        ids = dict(model.objects.filter(name__in=names).values_list('name', 'id'))
+        missing = sorted(set(names) - set(ids))
+        if missing:
+            model.objects.bulk_create([
+                model(name=name, **{field: default(name) for field, default in defaults.items()})
+                for name in missing
+            ])
+            ids.update(model.objects.filter(name__in=missing).values_list('name', 'id'))
+            for name in missing:
+                self.stdout.write(f'Created new {model._meta.verbose_name}: {name}')
+        return ids
 
-        for district_name, cases_str in matches:
-            district_name = district_name.strip()
+    def parse_row(self, row):
+        """Weekly values of a single row of CSV data"""
+        # Parse case numbers (handle empty strings and non-numeric values)
+        def safe_int(value):
+            if not value or value.strip() == '':
+                return None
             try:
-                cases = int(cases_str)
-                
-                # Get or create district
-                district, created = District.objects.get_or_create(
-                    name=district_name,
-                    defaults={'province': 'Unknown'}  # We can update this later with proper province data
-                )
-                
-                if created:
-                    self.stdout.write(f'Created new district: {district_name}')
-
-                # Create district case data
-                district_case, created = DistrictCaseData.objects.update_or_create(
-                    surveillance_data=surveillance_data,
-                    district=district,
-                    defaults={'cases': cases}
-                )
-
-                if created:
-                    self.stdout.write(f'Added case data: {district_name} - {cases} cases')
+                return int(value)
+            except (ValueError, TypeError):
+                return None
 
-            except (ValueError, TypeError) as e:
-                self.stdout.write(
-                    self.style.WARNING(f'Error parsing district data for {district_name}: {str(e)}')
-                )
+        return {
+            'source_file': row['Source_File'],
+            'previous_week_cases': safe_int(row['Previous_Week_Cases']),
+            'current_week_cases': safe_int(row['Current_Week_Cases']),
+            'change_in_cases': safe_int(row['Change_in_Cases']),
+            'same_week_last_year': safe_int(row['Same_Week_Last_Year']),
+            'year_over_year_change': safe_int(row['Year_over_Year_Change']),
+            'trend': row['Trend'],
+            'top_affected_districts': row['Top_Affected_Districts'],
+        }
+
+    def parse_district_data(self, districts_data):
+        """Extract (district name, cases) pairs from the top affected districts"""
+        if not districts_data or districts_data.strip() == '':
+            return []
+
+        # Parse district data - format like "KATHMANDU (52), KAILALI (44), PARSA (39)"
+        return [
+            (district_name.strip(), int(cases_str))
+            for district_name, cases_str in DISTRICT_PATTERN.findall(districts_data)
+        ]
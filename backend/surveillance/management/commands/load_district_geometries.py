@@ -0,0 +1,112 @@
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from surveillance.aliases import district_key, district_lookup
+from surveillance.geo import COORDINATE_PRECISION, DEFAULT_TOLERANCE, simplify_geometry
+from surveillance.models import District
+
+
+class Command(BaseCommand):
+    help = 'Load simplified district boundaries from a GeoJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            type=str,
+            default=str(settings.DISTRICT_GEOJSON_PATH),
+            help='Path to a GeoJSON FeatureCollection of district boundaries'
+        )
+        parser.add_argument(
+            '--name-property',
+            type=str,
+            default='DISTRICT',
+            help='Feature property holding the district name'
+        )
+        parser.add_argument(
+            '--province-property',
+            type=str,
+            default='PROVINCE',
+            help='Feature property holding the province name'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=DEFAULT_TOLERANCE,
+            help='Simplification tolerance in degrees'
+        )
+        parser.add_argument(
+            '--precision',
+            type=int,
+            default=COORDINATE_PRECISION,
+            help='Decimal places kept for coordinates'
+        )
+
+    def handle(self, *args, **options):
+        geojson_file = options['file']
+
+        try:
+            with open(geojson_file, 'r', encoding='utf-8') as file:
+                collection = json.load(file)
+        except FileNotFoundError:
+            # No boundary file ships with the repository, so this is the usual first-run failure
+            raise CommandError(
+                f'File {geojson_file} not found. Download a GeoJSON of the district boundaries '
+                f'and pass it with --file.'
+            )
+
+        # Features are matched to the districts named in the EWARS data, never created:
+        # a boundary file spelling a name differently would otherwise add a duplicate
+        districts = District.objects.in_bulk()
+        lookup = district_lookup((district.id, district.name) for district in districts.values())
+
+        loaded, unmatched = set(), []
+        with transaction.atomic():
+            for feature in collection.get('features', []):
+                properties = feature.get('properties') or {}
+                name = str(properties.get(options['name_property']) or '').strip()
+                if not name or not feature.get('geometry'):
+                    continue
+
+                district = districts.get(lookup.get(district_key(name)))
+                if district is None:
+                    unmatched.append(name)
+                    continue
+                if district.id in loaded:
+                    self.stdout.write(self.style.WARNING(
+                        f'Several features match {district.name}; keeping the last one ({name})'
+                    ))
+
+                try:
+                    geometry = simplify_geometry(
+                        feature['geometry'], options['tolerance'], options['precision']
+                    )
+                except ValueError as e:
+                    self.stdout.write(self.style.WARNING(f'Skipping {name}: {str(e)}'))
+                    continue
+
+                district.geometry = geometry
+                province = properties.get(options['province_property'])
+                if province and district.province in (None, '', 'Unknown'):
+                    district.province = str(province)
+                district.save()
+                loaded.add(district.id)
+
+            if not loaded:
+                raise CommandError(
+                    f'No feature in {geojson_file} matches a known district; check --name-property '
+                    f'(currently {options["name_property"]!r}) and import the surveillance data first'
+                )
+
+        if unmatched:
+            self.stdout.write(self.style.WARNING(
+                f'{len(unmatched)} features match no district and were skipped '
+                f'(add their spelling to DISTRICT_ALIASES): {", ".join(sorted(unmatched))}'
+            ))
+        missing = sorted(district.name for district in districts.values() if district.id not in loaded)
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                f'No geometry for {len(missing)} districts: {", ".join(missing)}'
+            ))
+
+        self.stdout.write(self.style.SUCCESS(f'Loaded geometry for {len(loaded)} districts'))
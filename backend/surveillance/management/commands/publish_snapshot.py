@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from surveillance.snapshots import publish_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Publish the current surveillance data as the read snapshot for dashboard endpoints'
+
+    def handle(self, *args, **options):
+        snapshot = publish_snapshot()
+        if snapshot is None:
+            self.stdout.write('The database is not SQLite; dashboard endpoints read it directly')
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'Published read snapshot: {snapshot}'))
@@ -0,0 +1,93 @@
+import os
+import socket
+import threading
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from surveillance.jobs import claim_next, requeue_stale_jobs, run_job
+from surveillance.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (post-import computation)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Number of worker threads processing jobs in parallel'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no job is due instead of polling for new ones'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the queue is empty'
+        )
+
+    def handle(self, *args, **options):
+        worker_name = f'{socket.gethostname()}:{os.getpid()}'
+        stop = threading.Event()
+
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale jobs')
+
+        threads = [
+            threading.Thread(
+                target=self.work,
+                args=(f'{worker_name}:{index}', options, stop),
+                daemon=True,
+            )
+            for index in range(max(options['concurrency'], 1))
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping workers after their current job...')
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(self.style.SUCCESS('Job worker stopped'))
+
+    def work(self, worker, options, stop):
+        """Claim and run jobs until stopped (or the queue is drained with --once)"""
+        try:
+            while not stop.is_set():
+                try:
+                    job = claim_next(worker)
+                except OperationalError as e:
+                    # SQLite reports "database is locked" while an import holds the write lock
+                    self.stdout.write(self.style.WARNING(f'{worker}: queue unavailable ({str(e)})'))
+                    stop.wait(options['poll_interval'])
+                    continue
+
+                if job is None:
+                    if options['once']:
+                        return
+                    stop.wait(options['poll_interval'])
+                    continue
+
+                self.stdout.write(f'{worker}: running {job}')
+                try:
+                    job = run_job(job)
+                except OperationalError as e:
+                    # Left running; requeue_stale_jobs() returns it to the queue later
+                    self.stdout.write(self.style.ERROR(
+                        f'{worker}: could not record the outcome of {job} ({str(e)})'
+                    ))
+                    continue
+                style = self.style.SUCCESS if job.status == Job.STATUS_SUCCEEDED else self.style.WARNING
+                self.stdout.write(style(f'{worker}: {job}'))
+        finally:
+            connection.close()
@@ -0,0 +1,112 @@
+"""
+Derived weekly metrics computed from the stored series.
+
+The CSV's own deltas are not trusted: one query with window functions reads
+every disease series with its previous week, same week last year and a
+four-week rolling sum, and the differences are written back with a bulk
+update. A "previous" value is only used when it really is the adjacent week
+(or the same week of the previous year), and a rolling sum only when it covers
+four consecutive reported weeks, so gaps in the series give NULLs instead of
+wrong values.
+"""
+from django.db import transaction
+from django.db.models import Count, F, RowRange, Sum, Window
+from django.db.models.functions import Lag
+
+from .bulk import update_rows
+from .models import WeeklySurveillanceData
+
+# Rolling sums cover the last four reported weeks of a series
+ROLLING_WEEKS = 4
+
+METRIC_FIELDS = [
+    'computed_previous_week_cases',
+    'computed_change_in_cases',
+    'computed_year_over_year_change',
+    'rolling_4_week_cases',
+    'growth_rate',
+]
+
+
+def _is_previous_week(year, week, previous_year, previous_week):
+    if previous_year is None:
+        return False
+    if previous_year == year:
+        return previous_week == week - 1
+    # Week 1 follows week 52 or 53 of the previous year
+    return previous_year == year - 1 and week == 1 and previous_week >= 52
+
+
+def _difference(value, other):
+    if value is None or other is None:
+        return None
+    return value - other
+
+
+def series_metrics(using='default'):
+    """Compute the derived metrics for every row in one window-function query"""
+    by_week = {
+        'partition_by': [F('disease_id')],
+        'order_by': [F('year').asc(), F('week_number').asc()],
+    }
+    by_year = {
+        'partition_by': [F('disease_id'), F('week_number')],
+        'order_by': [F('year').asc()],
+    }
+
+    # The rolling frame counts rows; the weeks of the earlier rows tell whether they are consecutive
+    rolling_frame = RowRange(start=-(ROLLING_WEEKS - 1), end=0)
+    rolling_lags = {}
+    for offset in range(2, ROLLING_WEEKS):
+        rolling_lags[f'lag{offset}_year'] = Window(Lag('year', offset), **by_week)
+        rolling_lags[f'lag{offset}_week'] = Window(Lag('week_number', offset), **by_week)
+
+    rows = WeeklySurveillanceData.objects.using(using).order_by().annotate(
+        lag_year=Window(Lag('year'), **by_week),
+        lag_week=Window(Lag('week_number'), **by_week),
+        lag_cases=Window(Lag('current_week_cases'), **by_week),
+        rolling_cases=Window(Sum('current_week_cases'), frame=rolling_frame, **by_week),
+        rolling_count=Window(Count('current_week_cases'), frame=rolling_frame, **by_week),
+        **rolling_lags,
+        last_year=Window(Lag('year'), **by_year),
+        last_year_cases=Window(Lag('current_week_cases'), **by_year),
+    ).values(
+        'id', 'year', 'week_number', 'current_week_cases', 'lag_year', 'lag_week',
+        'lag_cases', 'rolling_cases', 'rolling_count', *rolling_lags, 'last_year', 'last_year_cases',
+        *METRIC_FIELDS
+    )
+
+    for row in rows:
+        current = row['current_week_cases']
+        previous = row['lag_cases'] if _is_previous_week(
+            row['year'], row['week_number'], row['lag_year'], row['lag_week']
+        ) else None
+        last_year = row['last_year_cases'] if row['last_year'] == row['year'] - 1 else None
+        change = _difference(current, previous)
+        # Only a full sum over consecutive weeks is a rolling 4-week value
+        weeks = [(row['year'], row['week_number']), (row['lag_year'], row['lag_week'])] + [
+            (row[f'lag{offset}_year'], row[f'lag{offset}_week']) for offset in range(2, ROLLING_WEEKS)
+        ]
+        rolling_complete = row['rolling_count'] == ROLLING_WEEKS and all(
+            _is_previous_week(*later, *earlier) for later, earlier in zip(weeks, weeks[1:])
+        )
+
+        yield row, {
+            'computed_previous_week_cases': previous,
+            'computed_change_in_cases': change,
+            'computed_year_over_year_change': _difference(current, last_year),
+            'rolling_4_week_cases': row['rolling_cases'] if rolling_complete else None,
+            'growth_rate': round(change / previous, 4) if change is not None and previous else None,
+        }
+
+
+def refresh_computed_metrics(using='default'):
+    """Recompute and store the derived metrics; returns the number of rows changed"""
+    changed = []
+    for row, metrics in series_metrics(using):
+        if any(row[field] != value for field, value in metrics.items()):
+            changed.append({'id': row['id'], **metrics})
+
+    with transaction.atomic(using=using):
+        update_rows(WeeklySurveillanceData, changed, METRIC_FIELDS, using=using)
+    return len(changed)
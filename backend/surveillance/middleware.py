@@ -0,0 +1,82 @@
+"""
+Brotli response compression.
+
+Brotli is an optional dependency. Without the ``brotli`` package installed,
+or when the client does not accept ``br``, responses pass through unchanged
+and Django's GZipMiddleware compresses them instead.
+"""
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Responses shorter than this are not worth compressing (same as GZipMiddleware)
+MIN_COMPRESS_LENGTH = 200
+
+# Quality 5 compresses about as fast as gzip's default while producing smaller output
+BROTLI_QUALITY = 5
+
+
+def accepts_encoding(header, coding):
+    """
+    Whether an Accept-Encoding header allows a content coding.
+
+    A coding listed with ``q=0`` is refused; ``*`` stands for every coding
+    not listed by name.
+    """
+    wildcard = False
+    for item in header.split(','):
+        name, *params = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        name = name.lower()
+        if name == coding:
+            return quality > 0
+        if name == '*':
+            wildcard = quality > 0
+    return wildcard
+
+
+class BrotliMiddleware:
+    """Compress responses with Brotli for clients that accept it"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if (
+            brotli is None
+            or response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < MIN_COMPRESS_LENGTH
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        if not accepts_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), 'br'):
+            return response
+
+        compressed = brotli.compress(response.content, quality=BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = 'br'
+
+        # The body changed, so a strong ETag would no longer be accurate
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveillance', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='district',
+            name='geometry',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
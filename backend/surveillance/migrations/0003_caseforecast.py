@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveillance', '0002_district_geometry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaseForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_number', models.IntegerField()),
+                ('year', models.IntegerField()),
+                ('horizon', models.IntegerField()),
+                ('method', models.CharField(max_length=50)),
+                ('predicted_cases', models.FloatField()),
+                ('lower_bound', models.FloatField()),
+                ('upper_bound', models.FloatField()),
+                ('generated_at', models.DateTimeField(auto_now_add=True)),
+                ('disease', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forecasts', to='surveillance.disease')),
+                ('district', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='forecasts', to='surveillance.district')),
+            ],
+            options={
+                'ordering': ['disease__name', 'district__name', 'horizon'],
+                'indexes': [models.Index(fields=['disease', 'district', 'horizon'], name='surveillanc_disease_b0584f_idx')],
+            },
+        ),
+    ]
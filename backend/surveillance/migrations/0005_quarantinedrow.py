@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveillance', '0004_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuarantinedRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_file', models.CharField(max_length=255)),
+                ('line_number', models.IntegerField()),
+                ('data', models.JSONField()),
+                ('errors', models.JSONField(default=list)),
+                ('warnings', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at', 'source_file', 'line_number'],
+            },
+        ),
+    ]
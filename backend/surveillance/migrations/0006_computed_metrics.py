@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveillance', '0005_quarantinedrow'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='weeklysurveillancedata',
+            name='computed_change_in_cases',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='weeklysurveillancedata',
+            name='computed_previous_week_cases',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='weeklysurveillancedata',
+            name='computed_year_over_year_change',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='weeklysurveillancedata',
+            name='growth_rate',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='weeklysurveillancedata',
+            name='rolling_4_week_cases',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='weeklysurveillancedata',
+            index=models.Index(fields=['year', 'week_number', 'computed_change_in_cases'], name='surveillanc_year_cff1b5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weeklysurveillancedata',
+            index=models.Index(fields=['year', 'week_number', 'growth_rate'], name='surveillanc_year_387e30_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveillance', '0006_computed_metrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurveillanceRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('weekly', 'Weekly surveillance data'), ('district', 'District case data')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')], max_length=10)),
+                ('previous', models.JSONField(blank=True, null=True)),
+                ('source_file', models.CharField(blank=True, max_length=255, null=True)),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-recorded_at', '-id'],
+                'indexes': [models.Index(fields=['kind', 'recorded_at'], name='surveillanc_kind_8627b6_idx'), models.Index(fields=['kind', 'object_id'], name='surveillanc_kind_004d8e_idx')],
+            },
+        ),
+    ]
@@ -21,6 +21,10 @@ class District(models.Model):
     name = models.CharField(max_length=100, unique=True)
     province = models.CharField(max_length=100, blank=True, null=True)
     population = models.IntegerField(blank=True, null=True)
+
+    # Simplified, coordinate-quantized GeoJSON geometry used by the heatmap
+    geometry = models.JSONField(blank=True, null=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -45,6 +49,13 @@ class WeeklySurveillanceData(models.Model):
     same_week_last_year = models.IntegerField(null=True, blank=True)
     year_over_year_change = models.IntegerField(null=True, blank=True)
     
+    # Derived from the stored series by surveillance.metrics after each import
+    computed_previous_week_cases = models.IntegerField(null=True, blank=True)
+    computed_change_in_cases = models.IntegerField(null=True, blank=True)
+    computed_year_over_year_change = models.IntegerField(null=True, blank=True)
+    rolling_4_week_cases = models.IntegerField(null=True, blank=True)
+    growth_rate = models.FloatField(null=True, blank=True)  # Week-over-week, 0.25 = +25%
+
     # Trend analysis
     trend = models.CharField(max_length=200, blank=True, null=True)
     
@@ -61,6 +72,10 @@ class WeeklySurveillanceData(models.Model):
     class Meta:
         ordering = ['-week_number', 'disease__name']
         unique_together = ['week_number', 'year', 'disease']
+        indexes = [
+            models.Index(fields=['year', 'week_number', 'computed_change_in_cases']),
+            models.Index(fields=['year', 'week_number', 'growth_rate']),
+        ]
 
 
 class DistrictCaseData(models.Model):
@@ -76,3 +91,134 @@ class DistrictCaseData(models.Model):
     class Meta:
         ordering = ['-cases']
         unique_together = ['surveillance_data', 'district']
+
+
+class CaseForecast(models.Model):
+    """Model to store short-horizon case forecasts for a disease (optionally per district)"""
+    disease = models.ForeignKey(Disease, on_delete=models.CASCADE, related_name='forecasts')
+    district = models.ForeignKey(
+        District, on_delete=models.CASCADE, related_name='forecasts', null=True, blank=True
+    )  # Null for the national series
+
+    # Forecast target
+    week_number = models.IntegerField()
+    year = models.IntegerField()
+    horizon = models.IntegerField()  # Weeks ahead of the last observed week
+
+    # Forecast values
+    method = models.CharField(max_length=50)
+    predicted_cases = models.FloatField()
+    lower_bound = models.FloatField()
+    upper_bound = models.FloatField()
+
+    # Metadata
+    generated_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        area = self.district.name if self.district else 'National'
+        return f"Week {self.week_number} - {self.disease.name} ({area}): {self.predicted_cases:.0f} cases"
+
+    class Meta:
+        ordering = ['disease__name', 'district__name', 'horizon']
+        indexes = [
+            models.Index(fields=['disease', 'district', 'horizon']),
+        ]
+
+
+class Job(models.Model):
+    """Model to store background jobs processed by the `run_jobs` worker"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+
+    # Retry bookkeeping
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+    worker = models.CharField(max_length=100, blank=True, null=True)
+
+    # Metadata
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+
+class QuarantinedRow(models.Model):
+    """Model to store imported rows held back by data-quality checks"""
+    source_file = models.CharField(max_length=255)
+    line_number = models.IntegerField()
+    data = models.JSONField()  # The raw CSV row
+    errors = models.JSONField(default=list)
+    warnings = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.source_file}:{self.line_number} ({', '.join(self.errors)})"
+
+    class Meta:
+        ordering = ['-created_at', 'source_file', 'line_number']
+
+
+class SurveillanceRevision(models.Model):
+    """
+    Model to store the append-only revision history of surveillance records.
+
+    Only the fields a revision changed are stored, with their values from
+    before the change, so history can be rolled back from the current data.
+    """
+    KIND_WEEKLY = 'weekly'
+    KIND_DISTRICT = 'district'
+    KIND_CHOICES = [
+        (KIND_WEEKLY, 'Weekly surveillance data'),
+        (KIND_DISTRICT, 'District case data'),
+    ]
+
+    ACTION_CREATE = 'create'
+    ACTION_UPDATE = 'update'
+    ACTION_DELETE = 'delete'
+    ACTION_CHOICES = [
+        (ACTION_CREATE, 'Create'),
+        (ACTION_UPDATE, 'Update'),
+        (ACTION_DELETE, 'Delete'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()  # Not a foreign key: history outlives deleted rows
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+
+    # Changed fields -> value before the revision (all fields for a delete, null for a create)
+    previous = models.JSONField(blank=True, null=True)
+
+    source_file = models.CharField(max_length=255, blank=True, null=True)
+    recorded_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} {self.action} at {self.recorded_at:%Y-%m-%d %H:%M}"
+
+    class Meta:
+        ordering = ['-recorded_at', '-id']
+        indexes = [
+            models.Index(fields=['kind', 'recorded_at']),
+            models.Index(fields=['kind', 'object_id']),
+        ]
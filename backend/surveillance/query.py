@@ -0,0 +1,230 @@
+"""
+Multi-dimensional aggregate queries over the surveillance data.
+
+A query names group-by dimensions, measures and range filters; it is compiled
+to a single GROUP BY query against either the national weekly table or the
+district case table, depending on which dimensions and measures it needs.
+"""
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Avg, Max, Min, Sum
+
+from .models import DistrictCaseData, WeeklySurveillanceData
+from .snapshots import dataset_version
+
+# Largest number of result rows a single query may return
+MAX_RESULT_ROWS = 1000
+
+QUERY_CACHE_TIMEOUT = 60 * 15
+
+# Dimension -> (weekly field, district field); None if the table lacks it
+DIMENSIONS = {
+    'disease': ('disease__name', 'surveillance_data__disease__name'),
+    'district': (None, 'district__name'),
+    'province': (None, 'district__province'),
+    'week': ('week_number', 'surveillance_data__week_number'),
+    'year': ('year', 'surveillance_data__year'),
+}
+
+# Measure -> (weekly field, district field)
+MEASURES = {
+    'cases': ('current_week_cases', 'cases'),
+    'change': ('change_in_cases', None),
+    'last_year_cases': ('same_week_last_year', None),
+    'computed_change': ('computed_change_in_cases', None),
+    'rolling_cases': ('rolling_4_week_cases', None),
+    'growth_rate': ('growth_rate', None),
+}
+
+AGGREGATES = {
+    'sum': Sum,
+    'avg': Avg,
+    'max': Max,
+    'min': Min,
+}
+
+# Range filter parameter -> (dimension or measure, lookup)
+RANGE_FILTERS = {
+    'week_min': ('week', 'gte'),
+    'week_max': ('week', 'lte'),
+    'year_min': ('year', 'gte'),
+    'year_max': ('year', 'lte'),
+    'cases_min': ('cases', 'gte'),
+    'cases_max': ('cases', 'lte'),
+}
+
+# Equality filters accepting comma-separated values
+LIST_FILTERS = ('disease', 'district', 'province', 'week', 'year')
+
+
+class QueryError(ValueError):
+    """Raised for queries that cannot be compiled"""
+
+
+def _split(value):
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+
+def _parse_int(name, value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise QueryError(f'{name} must be an integer')
+
+
+def _check_unique(name, values):
+    seen = set()
+    for value in values:
+        if value in seen:
+            raise QueryError(f'{name} lists {value} more than once')
+        seen.add(value)
+
+
+def parse_query(params):
+    """Validate query parameters into a normalized query description"""
+    group_by = _split(params.get('group_by'))
+    for dimension in group_by:
+        if dimension not in DIMENSIONS:
+            raise QueryError(f'Unknown dimension: {dimension}')
+    # Each column of the result must be distinct for the rows to line up with them
+    _check_unique('group_by', group_by)
+
+    specs = _split(params.get('measures')) or ['sum:cases']
+    measures = []
+    for spec in specs:
+        aggregate, _, measure = spec.partition(':')
+        if aggregate not in AGGREGATES or measure not in MEASURES:
+            raise QueryError(f'Unknown measure: {spec} (expected e.g. sum:cases)')
+        measures.append((aggregate, measure))
+    _check_unique('measures', specs)
+
+    filters = {}
+    for name in LIST_FILTERS:
+        values = _split(params.get(name))
+        if values:
+            if name in ('week', 'year'):
+                values = [_parse_int(name, value) for value in values]
+            elif name == 'district':
+                values = [value.upper() for value in values]
+            filters[name] = sorted(values)
+
+    ranges = {}
+    for name in RANGE_FILTERS:
+        if params.get(name) not in (None, ''):
+            ranges[name] = _parse_int(name, params.get(name))
+
+    limit = _parse_int('limit', params.get('limit', MAX_RESULT_ROWS))
+    if limit < 1 or limit > MAX_RESULT_ROWS:
+        raise QueryError(f'limit must be between 1 and {MAX_RESULT_ROWS}')
+
+    aliases = [f'{aggregate}_{measure}' for aggregate, measure in measures]
+    order_by = params.get('order_by') or f'-{aliases[0]}'
+    if order_by.lstrip('-') not in aliases + group_by:
+        raise QueryError(f'order_by must be one of: {", ".join(aliases + group_by)}')
+
+    return {
+        'group_by': group_by,
+        'measures': measures,
+        'filters': filters,
+        'ranges': ranges,
+        'limit': limit,
+        'order_by': order_by,
+    }
+
+
+def _fact_table(query):
+    """Pick the table that can answer the query: 0 = weekly, 1 = district"""
+    needed = set(query['group_by']) | set(query['filters'])
+    needed |= {RANGE_FILTERS[name][0] for name in query['ranges']}
+    if any(DIMENSIONS[name][0] is None for name in needed if name in DIMENSIONS):
+        table = 1
+    else:
+        table = 0
+
+    for aggregate, measure in query['measures']:
+        if MEASURES[measure][table] is None:
+            raise QueryError(f'Measure {measure} is not available per district')
+    return table
+
+
+def compile_query(query, using='default'):
+    """
+    Build the queryset for a parsed query.
+
+    Returns (queryset, dimension_fields, annotations). With group-by dimensions
+    the queryset is already grouped and annotated; without any, the caller
+    aggregates the filtered queryset with the annotations.
+    """
+    table = _fact_table(query)
+    model = DistrictCaseData if table else WeeklySurveillanceData
+
+    def field(name):
+        return (DIMENSIONS.get(name) or MEASURES[name])[table]
+
+    queryset = model.objects.using(using)
+    for name, values in query['filters'].items():
+        queryset = queryset.filter(**{f'{field(name)}__in': values})
+    for name, value in query['ranges'].items():
+        target, lookup = RANGE_FILTERS[name]
+        queryset = queryset.filter(**{f'{field(target)}__{lookup}': value})
+
+    annotations = {
+        f'{aggregate}_{measure}': AGGREGATES[aggregate](field(measure))
+        for aggregate, measure in query['measures']
+    }
+    dimension_fields = {name: field(name) for name in query['group_by']}
+
+    if not dimension_fields:
+        return queryset.order_by(), dimension_fields, annotations
+
+    descending = query['order_by'].startswith('-')
+    order_field = query['order_by'].lstrip('-')
+    order_field = dimension_fields.get(order_field, order_field)
+
+    # order_by() also replaces the models' default ordering, which would otherwise add joins
+    queryset = queryset.values(*dimension_fields.values()).annotate(**annotations).order_by(
+        f'-{order_field}' if descending else order_field,
+        *dimension_fields.values(),
+    )
+    return queryset, dimension_fields, annotations
+
+
+def run_query(params, using='default'):
+    """Execute a query (cached per dataset version) and return a columnar result"""
+    query = parse_query(params)
+
+    version = dataset_version(using)
+    cache_key = None
+    if version:
+        digest = hashlib.sha1(json.dumps(query, sort_keys=True).encode('utf-8')).hexdigest()
+        cache_key = f'surveillance-query:{version}:{digest}'
+        result = cache.get(cache_key)
+        if result is not None:
+            return result
+
+    aliases = [f'{aggregate}_{measure}' for aggregate, measure in query['measures']]
+    queryset, dimension_fields, annotations = compile_query(query, using)
+
+    if dimension_fields:
+        # Fetch one extra row to know whether the result was cut off
+        records = list(queryset[:query['limit'] + 1])
+        truncated = len(records) > query['limit']
+        fields = list(dimension_fields.values()) + aliases
+        rows = [[record[name] for name in fields] for record in records[:query['limit']]]
+    else:
+        truncated = False
+        totals = queryset.aggregate(**annotations)
+        rows = [[totals[alias] for alias in aliases]]
+
+    result = {
+        'group_by': query['group_by'],
+        'columns': query['group_by'] + aliases,
+        'rows': rows,
+        'row_count': len(rows),
+        'truncated': truncated,
+    }
+    if cache_key:
+        cache.set(cache_key, result, QUERY_CACHE_TIMEOUT)
+    return result
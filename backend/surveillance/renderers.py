@@ -0,0 +1,53 @@
+"""
+Compact wire format for the mobile app.
+
+``ColumnarJSONRenderer`` is selected with ``?format=columnar`` or an
+``Accept: application/vnd.eaarogya.columnar+json`` header. It writes every
+list of objects as ``{"columns": [...], "rows": [[...], ...]}`` so keys are
+sent once per list instead of once per item, and ``*_at`` timestamps as
+integer Unix seconds.
+"""
+from django.utils.dateparse import parse_datetime
+from rest_framework.renderers import JSONRenderer
+
+
+def _timestamp(value):
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None or parsed.tzinfo is None:
+        return value
+    return int(parsed.timestamp())
+
+
+def _compact_value(value, key=None):
+    if isinstance(value, dict):
+        return {name: _compact_value(item, name) for name, item in value.items()}
+    if isinstance(value, list):
+        return to_columnar(value)
+    # Timestamp fields follow the *_at naming convention of the models
+    if key is not None and key.endswith('_at'):
+        return _timestamp(value)
+    return value
+
+
+def to_columnar(items):
+    """Turn a list of objects sharing the same keys into columns and rows"""
+    if not items or not all(isinstance(item, dict) for item in items):
+        return [_compact_value(item) for item in items]
+
+    columns = list(items[0])
+    if any(list(item) != columns for item in items):
+        return [_compact_value(item) for item in items]
+
+    return {
+        'columns': columns,
+        'rows': [[_compact_value(item[column], column) for column in columns] for item in items],
+    }
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """JSON renderer writing lists of objects column-wise"""
+    media_type = 'application/vnd.eaarogya.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(_compact_value(data), accepted_media_type, renderer_context)
@@ -0,0 +1,230 @@
+"""
+Append-only revision history for weekly and district surveillance records.
+
+EWARS sometimes revises a published week. Instead of overwriting silently, the
+importer records each create, update and delete in ``SurveillanceRevision``,
+storing only the fields that changed together with their previous values
+(a reverse diff). The hot tables stay unchanged; the state as of an earlier
+moment is rebuilt by undoing the revisions recorded after it.
+"""
+from django.utils import timezone
+
+from .bulk import insert_rows, update_rows
+from .models import DistrictCaseData, SurveillanceRevision, WeeklySurveillanceData
+
+# Kind -> (model, identifying fields, revised fields). Other fields (such as the
+# source file name, which changes whenever a bulletin is re-published) are
+# saved without a revision.
+TRACKED = {
+    SurveillanceRevision.KIND_WEEKLY: (
+        WeeklySurveillanceData,
+        ['disease_id', 'week_number', 'year'],
+        [
+            'previous_week_cases', 'current_week_cases', 'change_in_cases',
+            'same_week_last_year', 'year_over_year_change', 'trend', 'top_affected_districts',
+        ],
+    ),
+    SurveillanceRevision.KIND_DISTRICT: (
+        DistrictCaseData,
+        ['surveillance_data_id', 'district_id'],
+        ['cases'],
+    ),
+}
+
+# Records whose revisions are read per query when reconstructing history
+REVISION_BATCH_SIZE = 500
+
+
+def _load_existing(model, key_fields, keys, value_fields, batch_size):
+    """Existing rows with the given keys as {key: values}, narrowed by the first identifying field"""
+    existing = {}
+    first_values = sorted({key[0] for key in keys})
+    for start in range(0, len(first_values), batch_size):
+        chunk = first_values[start:start + batch_size]
+        # A range is much cheaper to compile than a long IN list; other rows are skipped below
+        rows = model.objects.filter(**{
+            f'{key_fields[0]}__gte': chunk[0],
+            f'{key_fields[0]}__lte': chunk[-1],
+        }).order_by().values('id', *key_fields, *value_fields)
+        for row in rows:
+            key = tuple(row[field] for field in key_fields)
+            if key in keys:
+                existing[key] = row
+    return existing
+
+
+def save_revised_bulk(kind, records, batch_size=1000):
+    """
+    Create or update many records with a few bulk statements, logging what changed.
+
+    ``records`` is an iterable of (key, values, source_file) where key holds the
+    identifying fields in TRACKED order. A key given more than once keeps its
+    last values. Returns (ids by key, number created, number updated).
+    """
+    model, key_fields, fields = TRACKED[kind]
+
+    latest = {}
+    for key, values, source_file in records:
+        latest[key] = (values, source_file)
+    value_fields = sorted({field for values, _ in latest.values() for field in values})
+
+    existing = _load_existing(model, key_fields, latest, value_fields, batch_size)
+    auto_now_fields = [
+        field.attname for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)
+    ]
+    now = timezone.now()
+
+    created, updated, revisions = [], [], []
+    for key, (values, source_file) in latest.items():
+        row = existing.get(key)
+        if row is None:
+            created.append({**dict(zip(key_fields, key)), **values})
+            continue
+
+        changed = [field for field, value in values.items() if row[field] != value]
+        if not changed:
+            continue
+
+        previous = {field: row[field] for field in changed if field in fields}
+        row.update(values)
+        row.update(dict.fromkeys(auto_now_fields, now))
+        updated.append(row)
+
+        if previous:
+            revisions.append({
+                'kind': kind,
+                'object_id': row['id'],
+                'action': SurveillanceRevision.ACTION_UPDATE,
+                'previous': previous,
+                'source_file': source_file,
+            })
+
+    update_rows(model, updated, value_fields + auto_now_fields)
+
+    ids = {key: row['id'] for key, row in existing.items()}
+    if created:
+        insert_rows(model, created)
+        # Read back the primary keys of the new records
+        new_keys = {key for key in latest if key not in existing}
+        for key, row in _load_existing(model, key_fields, new_keys, [], batch_size).items():
+            ids[key] = row['id']
+            revisions.append({
+                'kind': kind,
+                'object_id': row['id'],
+                'action': SurveillanceRevision.ACTION_CREATE,
+                'source_file': latest[key][1],
+            })
+    insert_rows(SurveillanceRevision, revisions)
+
+    return ids, len(created), len(updated)
+
+
+def record_deletions(kind, queryset, source_file=None):
+    """Log the full values of records about to be deleted; returns the number logged"""
+    _, key_fields, fields = TRACKED[kind]
+    revisions = [
+        SurveillanceRevision(
+            kind=kind,
+            object_id=values.pop('id'),
+            action=SurveillanceRevision.ACTION_DELETE,
+            previous=values,
+            source_file=source_file,
+        )
+        for values in queryset.order_by().values('id', *key_fields, *fields).iterator()
+    ]
+    SurveillanceRevision.objects.bulk_create(revisions, batch_size=1000)
+    return len(revisions)
+
+
+def _matches(values, filters):
+    for lookup, expected in filters.items():
+        field, _, operator = lookup.partition('__')
+        if operator == 'in':
+            if values.get(field) not in expected:
+                return False
+        elif values.get(field) != expected:
+            return False
+    return True
+
+
+def as_of(kind, when, **filters):
+    """
+    Records of a kind as they were known at ``when``, as {id: values}.
+
+    ``filters`` may use identifying fields with exact or ``__in`` lookups
+    (e.g. ``year=2024``, ``surveillance_data_id__in=[...]``).
+    """
+    # Long IN lists are split up; records of different chunks never share revisions
+    for lookup, values in filters.items():
+        if lookup.endswith('__in') and len(values) > REVISION_BATCH_SIZE:
+            values = list(values)
+            state = {}
+            for start in range(0, len(values), REVISION_BATCH_SIZE):
+                chunk = values[start:start + REVISION_BATCH_SIZE]
+                state.update(as_of(kind, when, **{**filters, lookup: chunk}))
+            return state
+
+    model, key_fields, fields = TRACKED[kind]
+
+    state = {
+        values['id']: values
+        for values in model.objects.filter(**filters).order_by().values('id', *key_fields, *fields)
+    }
+
+    revisions = SurveillanceRevision.objects.filter(kind=kind, recorded_at__gt=when)
+    if filters:
+        # Identifying fields never change, so only records matching now and matching
+        # records deleted since `when` can differ from their state at `when`
+        deleted = revisions.filter(
+            action=SurveillanceRevision.ACTION_DELETE,
+            **{f'previous__{lookup}': value for lookup, value in filters.items()}
+        ).values_list('object_id', flat=True)
+        object_ids = sorted(set(state) | set(deleted))
+        scans = [
+            revisions.filter(object_id__in=object_ids[start:start + REVISION_BATCH_SIZE])
+            for start in range(0, len(object_ids), REVISION_BATCH_SIZE)
+        ]
+    else:
+        scans = [revisions]
+
+    # Undo the revisions recorded after `when`, newest first; each record's
+    # revisions only touch that record, so the scans can run one after another
+    for scan in scans:
+        rows = scan.order_by('-recorded_at', '-id').values_list('object_id', 'action', 'previous')
+        for object_id, action, previous in rows.iterator():
+            if action == SurveillanceRevision.ACTION_CREATE:
+                state.pop(object_id, None)
+            elif action == SurveillanceRevision.ACTION_UPDATE:
+                if object_id in state:
+                    state[object_id].update(previous)
+            elif action == SurveillanceRevision.ACTION_DELETE and _matches(previous, filters):
+                state[object_id] = {'id': object_id, **previous}
+
+    return state
+
+
+def surveillance_as_of(when, **filters):
+    """Weekly records with their district cases as known at ``when``"""
+    weekly = as_of(SurveillanceRevision.KIND_WEEKLY, when, **filters)
+    districts = as_of(
+        SurveillanceRevision.KIND_DISTRICT, when, surveillance_data_id__in=list(weekly)
+    )
+
+    for values in weekly.values():
+        values['district_cases'] = []
+    for values in districts.values():
+        parent = weekly.get(values['surveillance_data_id'])
+        if parent is not None:
+            parent['district_cases'].append({
+                'district_id': values['district_id'],
+                'cases': values['cases'],
+            })
+
+    for values in weekly.values():
+        values['district_cases'].sort(key=lambda district_case: -district_case['cases'])
+
+    return sorted(
+        weekly.values(),
+        key=lambda values: (-values['year'], -values['week_number'], values['disease_id'])
+    )
+
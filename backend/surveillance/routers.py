@@ -0,0 +1,10 @@
+from .snapshots import SNAPSHOT_DB_ALIAS
+
+
+class SnapshotRouter:
+    """Keep the published snapshot database out of migrations; it is only ever a copy"""
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == SNAPSHOT_DB_ALIAS:
+            return False
+        return None
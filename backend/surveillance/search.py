@@ -0,0 +1,108 @@
+"""
+In-memory prefix search over diseases, districts, provinces and their aliases.
+
+The index is a sorted list of normalized keys searched with bisect, which
+answers prefix queries in well under a millisecond. Every word of a name is
+indexed, so "west" finds "RUKUM WEST". The index is rebuilt lazily whenever
+the served dataset changes (e.g. a new snapshot published by an import).
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from .aliases import DISEASE_ALIASES, DISTRICT_ALIASES
+from .models import Disease, District
+from .snapshots import dataset_version, read_alias
+
+# Rebuild at least this often even if the dataset version cannot be determined
+INDEX_MAX_AGE = 300
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# Rank of a match: full names before aliases before inner words
+RANK_NAME, RANK_ALIAS, RANK_WORD = 0, 1, 2
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def normalize(text):
+    return re.sub(r'\s+', ' ', str(text or '')).strip().lower()
+
+
+def _add(keys, name, entry, rank):
+    normalized = normalize(name)
+    if not normalized:
+        return
+    keys.append((normalized, rank, entry))
+    words = normalized.split(' ')
+    for i in range(1, len(words)):
+        keys.append((' '.join(words[i:]), RANK_WORD, entry))
+
+
+def build_index(using=None):
+    """Build the sorted key list from the database"""
+    using = using or read_alias()
+    keys = []
+
+    for disease_id, name in Disease.objects.using(using).values_list('id', 'name'):
+        entry = {'type': 'disease', 'id': disease_id, 'name': name}
+        _add(keys, name, entry, RANK_NAME)
+        for alias in DISEASE_ALIASES.get(name, []):
+            _add(keys, alias, {**entry, 'alias': alias}, RANK_ALIAS)
+
+    provinces = set()
+    for district_id, name, province in District.objects.using(using).values_list('id', 'name', 'province'):
+        entry = {'type': 'district', 'id': district_id, 'name': name, 'province': province}
+        _add(keys, name, entry, RANK_NAME)
+        for alias in DISTRICT_ALIASES.get(name, []):
+            _add(keys, alias, {**entry, 'alias': alias}, RANK_ALIAS)
+        if province and province != 'Unknown':
+            provinces.add(province)
+
+    for province in provinces:
+        _add(keys, province, {'type': 'province', 'id': None, 'name': province}, RANK_NAME)
+
+    keys.sort(key=lambda key: key[0])
+    return [key for key, _, _ in keys], [(rank, entry) for _, rank, entry in keys]
+
+
+def get_index():
+    """Current index, rebuilt when the served dataset has changed"""
+    global _index
+    using = read_alias()
+    version = dataset_version(using)
+    now = time.monotonic()
+
+    index = _index
+    if index is None or index[0] != version or now - index[1] > INDEX_MAX_AGE:
+        with _index_lock:
+            index = _index
+            if index is None or index[0] != version or now - index[1] > INDEX_MAX_AGE:
+                keys, entries = build_index(using)
+                index = _index = (version, now, keys, entries)
+    return index[2], index[3]
+
+
+def search(query, limit=DEFAULT_LIMIT, types=None):
+    """Prefix search; returns entries ordered by match quality, then name"""
+    prefix = normalize(query)
+    if not prefix:
+        return []
+
+    keys, entries = get_index()
+    best = {}
+    position = bisect_left(keys, prefix)
+    while position < len(keys) and keys[position].startswith(prefix):
+        rank, entry = entries[position]
+        position += 1
+        if types and entry['type'] not in types:
+            continue
+        identity = (entry['type'], entry['name'])
+        if identity not in best or rank < best[identity][0]:
+            best[identity] = (rank, entry)
+
+    ranked = sorted(best.values(), key=lambda item: (item[0], len(item[1]['name']), item[1]['name']))
+    return [entry for _, entry in ranked[:limit]]
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Disease, District, WeeklySurveillanceData, DistrictCaseData
+from .models import Disease, District, WeeklySurveillanceData, DistrictCaseData, CaseForecast
 
 
 class DiseaseSerializer(serializers.ModelSerializer):
@@ -31,7 +31,9 @@ class WeeklySurveillanceDataSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'source_file', 'week_number', 'year', 'disease',
             'previous_week_cases', 'current_week_cases', 'change_in_cases',
-            'same_week_last_year', 'year_over_year_change', 'trend',
+            'same_week_last_year', 'year_over_year_change',
+            'computed_previous_week_cases', 'computed_change_in_cases',
+            'computed_year_over_year_change', 'rolling_4_week_cases', 'growth_rate', 'trend',
             'top_affected_districts', 'district_cases', 'created_at', 'updated_at'
         ]
 
@@ -44,7 +46,8 @@ class DiseaseTrackerSerializer(serializers.ModelSerializer):
         model = WeeklySurveillanceData
         fields = [
             'week_number', 'disease_name', 'current_week_cases',
-            'change_in_cases', 'trend', 'top_affected_districts'
+            'change_in_cases', 'computed_change_in_cases', 'growth_rate',
+            'trend', 'top_affected_districts'
         ]
 
 
@@ -56,3 +59,15 @@ class NationalOverviewSerializer(serializers.Serializer):
     trending_down = serializers.IntegerField()
     most_affected_districts = serializers.ListField()
     recent_outbreaks = WeeklySurveillanceDataSerializer(many=True)
+
+
+class CaseForecastSerializer(serializers.ModelSerializer):
+    disease_name = serializers.CharField(source='disease.name')
+    district_name = serializers.CharField(source='district.name', default=None)
+
+    class Meta:
+        model = CaseForecast
+        fields = [
+            'id', 'disease_name', 'district_name', 'week_number', 'year', 'horizon',
+            'method', 'predicted_cases', 'lower_bound', 'upper_bound', 'generated_at'
+        ]
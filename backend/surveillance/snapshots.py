@@ -0,0 +1,91 @@
+"""
+Published read-only snapshots of the surveillance database.
+
+Dashboard endpoints read from a copy of the SQLite database that is only
+replaced once an import has committed. The copy is built next to the live
+snapshot and swapped in with an atomic rename, so readers never wait on the
+importer's write transaction and never see a half-imported week. Other
+database engines give readers a consistent view on their own, so there the
+endpoints simply read the default database.
+"""
+import os
+import sqlite3
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SNAPSHOT_DB_ALIAS = 'snapshot'
+
+
+def snapshot_path():
+    return Path(settings.DATABASES[SNAPSHOT_DB_ALIAS]['NAME'])
+
+
+def snapshots_supported():
+    """Whether the default database is a SQLite file that can be copied"""
+    return settings.DATABASES[DEFAULT_DB_ALIAS]['ENGINE'] == 'django.db.backends.sqlite3'
+
+
+def snapshot_available():
+    return (
+        snapshots_supported()
+        and SNAPSHOT_DB_ALIAS in settings.DATABASES
+        and snapshot_path().exists()
+    )
+
+
+def read_alias():
+    """Database alias the dashboard endpoints should read from"""
+    if getattr(settings, 'SERVE_FROM_SNAPSHOT', False) and snapshot_available():
+        return SNAPSHOT_DB_ALIAS
+    return DEFAULT_DB_ALIAS
+
+
+def publish_snapshot():
+    """
+    Copy the default database into a new snapshot and atomically swap it in.
+
+    Returns the snapshot path, or None when the default database is not
+    SQLite and readers use it directly.
+    """
+    if not snapshots_supported():
+        return None
+
+    source_settings = settings.DATABASES[DEFAULT_DB_ALIAS]
+
+    target = snapshot_path()
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = target.with_name(f'.{target.name}.{os.getpid()}.tmp')
+
+    source = sqlite3.connect(str(source_settings['NAME']))
+    try:
+        destination = sqlite3.connect(str(staging))
+        try:
+            # The backup API copies a consistent view even while other connections write
+            source.backup(destination)
+        finally:
+            destination.close()
+    finally:
+        source.close()
+
+    # Readers holding the old file keep it until they disconnect; new connections see the new one
+    os.replace(staging, target)
+    connections[SNAPSHOT_DB_ALIAS].close()
+    return target
+
+
+def dataset_version(alias=None):
+    """
+    Identifier of the data a reader currently sees, for cache keys.
+
+    Publishing a snapshot replaces the file, so its inode and mtime change; when
+    reading the main database any write changes it, which only costs cache hits.
+    Returns None when the database is not a local file and results should not be cached.
+    """
+    alias = alias or read_alias()
+    try:
+        stat = os.stat(settings.DATABASES[alias]['NAME'])
+    except (OSError, TypeError):
+        return None
+    return f'{alias}-{stat.st_ino}-{stat.st_mtime_ns}'
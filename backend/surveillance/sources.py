@@ -0,0 +1,49 @@
+"""
+Locating EWARS CSV files and the epidemiological year they belong to.
+
+Archives of earlier seasons are usually partitioned by year, either in the
+file name (``ewars_2019_w17.csv``) or in a directory (``archive/2019/17.csv``).
+A ``Year`` column in the file itself takes precedence over both.
+"""
+import re
+from pathlib import Path
+
+YEAR_PATTERN = re.compile(r'(?<!\d)(?:19|20)\d{2}(?!\d)')
+
+
+def discover_files(path):
+    """CSV files at a path: the file itself, or every CSV below a directory"""
+    path = Path(path)
+    if path.is_dir():
+        return sorted(path.rglob('*.csv'))
+    return [path]
+
+
+def detect_year(path, root=None):
+    """
+    Year named by a file or its directories, or None.
+
+    The file name is checked first, then its parent directories up to and
+    including ``root`` (only the immediate parent when no root is given), so
+    unrelated years higher up the path are ignored.
+    """
+    path = Path(path)
+    candidates = [path.stem]
+
+    root = Path(root) if root is not None else path.parent
+    for parent in path.parents:
+        candidates.append(parent.name)
+        if parent == root:
+            break
+
+    for name in candidates:
+        match = YEAR_PATTERN.search(name)
+        if match:
+            return int(match.group())
+    return None
+
+
+def row_year(row, default=None):
+    """Year of a CSV row from its ``Year`` column, falling back to ``default``"""
+    value = (row.get('Year') or '').strip()
+    return int(value) if value.isdecimal() else default
@@ -0,0 +1,14 @@
+"""
+Background tasks run by the `run_jobs` worker.
+
+Heavy modules are imported inside the task bodies so that registering the
+tasks stays cheap for every process that loads the app.
+"""
+from .jobs import task
+
+
+@task('refit_forecasts', post_import=True)
+def refit_forecasts():
+    """Refit the short-horizon case forecasts"""
+    from .forecasting import refit_forecasts as refit
+    return refit()
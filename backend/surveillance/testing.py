@@ -0,0 +1,22 @@
+"""
+Test runner for the project.
+
+Tests must never read a developer's published snapshot (see
+surveillance.snapshots): it is not a test database, so queries against it
+fail, and its contents would leak into the results.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Run the tests against the test database only"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.snapshot_override = override_settings(SERVE_FROM_SNAPSHOT=False)
+        self.snapshot_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.snapshot_override.disable()
+        super().teardown_test_environment(**kwargs)
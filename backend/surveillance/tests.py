@@ -1,3 +1,785 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import OperationalError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from .forecasting import advance_week, refit_forecasts
+from .metrics import refresh_computed_metrics
+from .models import (
+    CaseForecast, Disease, District, DistrictCaseData, Job, QuarantinedRow, SurveillanceRevision,
+    WeeklySurveillanceData,
+)
+from . import jobs, middleware, snapshots
+from .revisions import save_revised_bulk, surveillance_as_of
+from .sources import detect_year, row_year
+from .validation import invalid_row_indexes, run_checks, validate_rows
+
+
+def create_week(disease, year, week_number, cases, **values):
+    return WeeklySurveillanceData.objects.create(
+        source_file=f'{week_number}.csv',
+        disease=disease,
+        year=year,
+        week_number=week_number,
+        current_week_cases=cases,
+        **values
+    )
+
+
+class DashboardYearTests(TestCase):
+    """The dashboards show the latest week of the latest year only"""
+
+    def setUp(self):
+        self.dengue = Disease.objects.create(name='Dengue')
+        kathmandu = District.objects.create(name='KATHMANDU')
+
+        # Week 52 of the earlier season must not count as the latest week
+        old = create_week(self.dengue, 2023, 52, 500, trend='Increasing')
+        create_week(self.dengue, 2024, 3, 900, trend='Increasing')
+        latest = create_week(self.dengue, 2024, 5, 40, trend='Decreasing')
+
+        DistrictCaseData.objects.create(surveillance_data=old, district=kathmandu, cases=300)
+        DistrictCaseData.objects.create(surveillance_data=latest, district=kathmandu, cases=20)
+
+    def test_disease_tracker_uses_latest_year(self):
+        data = self.client.get('/api/v1/ewars/disease-tracker/').json()
+        self.assertEqual((data['year'], data['week_number']), (2024, 5))
+        self.assertEqual([item['current_week_cases'] for item in data['diseases']], [40])
+
+    def test_national_overview_uses_latest_year(self):
+        data = self.client.get('/api/v1/ewars/national-overview/').json()
+        self.assertEqual((data['latest_year'], data['latest_week']), (2024, 5))
+        self.assertEqual(data['total_cases'], 40)
+        self.assertEqual(data['most_affected_districts'], [{'name': 'KATHMANDU', 'cases': 20}])
+
+    def test_outbreak_alerts_use_latest_year(self):
+        data = self.client.get('/api/v1/ewars/outbreak-alerts/').json()
+        self.assertEqual(data['total_alerts'], 0)
+
+
+class GeometryRevalidationTests(TestCase):
+
+    def setUp(self):
+        # Enough districts for the payload to pass the compression threshold
+        for index in range(20):
+            District.objects.create(name=f'DISTRICT {index}', geometry={
+                'type': 'Point', 'coordinates': [85.0 + index / 100, 27.0],
+            })
+
+    def test_compressed_etag_revalidates(self):
+        for encoding in ('gzip', 'identity'):
+            with self.subTest(encoding=encoding):
+                response = self.client.get('/api/v1/geo/districts/', HTTP_ACCEPT_ENCODING=encoding)
+                self.assertEqual(response.status_code, 200)
+                if encoding == 'gzip':
+                    self.assertTrue(response['ETag'].startswith('W/'))
+
+                revalidated = self.client.get(
+                    '/api/v1/geo/districts/',
+                    HTTP_ACCEPT_ENCODING=encoding,
+                    HTTP_IF_NONE_MATCH=response['ETag'],
+                )
+                self.assertEqual(revalidated.status_code, 304)
+
+    @skipIf(middleware.brotli is None, 'brotli is not installed')
+    def test_brotli_only_when_accepted(self):
+        for accept_encoding, expected in [
+            ('gzip, deflate, br', 'br'),
+            ('gzip, br;q=0', 'gzip'),
+            ('gzip;q=0.5, br;q=0.0', 'gzip'),
+        ]:
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.client.get('/api/v1/geo/districts/', HTTP_ACCEPT_ENCODING=accept_encoding)
+                self.assertEqual(response['Content-Encoding'], expected)
+
+
+class AcceptEncodingTests(SimpleTestCase):
+
+    def test_q_values_are_honoured(self):
+        self.assertTrue(middleware.accepts_encoding('gzip, deflate, br', 'br'))
+        self.assertTrue(middleware.accepts_encoding('BR;q=0.8', 'br'))
+        self.assertFalse(middleware.accepts_encoding('gzip, br;q=0', 'br'))
+        self.assertFalse(middleware.accepts_encoding('br; q=0.000', 'br'))
+        self.assertFalse(middleware.accepts_encoding('gzip, brotli', 'br'))
+        self.assertFalse(middleware.accepts_encoding('', 'br'))
+
+    def test_wildcard_covers_unlisted_codings(self):
+        self.assertTrue(middleware.accepts_encoding('gzip, *', 'br'))
+        self.assertFalse(middleware.accepts_encoding('*;q=0', 'br'))
+        self.assertFalse(middleware.accepts_encoding('*, br;q=0', 'br'))
+
+
+def csv_row(week='17', disease='Dengue', previous='10', current='12', change='2',
+            last_year='5', year_over_year='7', districts='KATHMANDU (4)', **extra):
+    return {
+        'Source_File': f'{week}.csv',
+        'Week_Number': week,
+        'Disease_Syndrome': disease,
+        'Previous_Week_Cases': previous,
+        'Current_Week_Cases': current,
+        'Change_in_Cases': change,
+        'Same_Week_Last_Year': last_year,
+        'Year_over_Year_Change': year_over_year,
+        'Trend': 'Increasing',
+        'Top_Affected_Districts': districts,
+        **extra,
+    }
+
+
+class ValidationTests(SimpleTestCase):
+
+    def test_malformed_numbers_are_reported(self):
+        rows = [
+            csv_row(disease='A', previous='--5'),
+            csv_row(disease='B', previous='99999999999999999999'),
+            csv_row(disease='C', previous='1e3'),
+            csv_row(disease='D', districts='KATHMANDU (99999999999999999999)'),
+            csv_row(disease='E'),
+        ]
+        report = validate_rows(rows)
+
+        self.assertEqual(report['checks']['unparseable_number'], 3)
+        self.assertEqual(invalid_row_indexes(report), {0, 1, 2})
+
+    def test_deltas_must_match_their_counts(self):
+        report = validate_rows([
+            csv_row(disease='A'),
+            csv_row(disease='B', change='3'),
+            csv_row(disease='C', year_over_year='-7'),
+            csv_row(disease='D', current='', change='', year_over_year=''),
+        ])
+        issues = {issue['disease']: issue for issue in report['issues']}
+
+        self.assertEqual(issues['B']['errors'], ['change_mismatch'])
+        self.assertEqual(issues['C']['errors'], ['year_over_year_mismatch'])
+        # Missing counts are a warning, not a mismatch
+        self.assertEqual(issues['D']['errors'], [])
+        self.assertEqual(issues['D']['warnings'], ['missing_case_counts'])
+        self.assertNotIn('A', issues)
+        self.assertEqual(invalid_row_indexes(report), {1, 2})
+
+    def test_duplicates_conflict_only_when_their_values_differ(self):
+        rows = [
+            csv_row(week='17'),
+            {**csv_row(week='17'), 'Source_File': 'republished.csv'},
+            csv_row(week='18'),
+            csv_row(week='18', current='13', change='3', year_over_year='8'),
+        ]
+        masks = run_checks(rows)
+
+        self.assertEqual(masks['duplicate_row'].tolist(), [True, True, False, False])
+        self.assertEqual(masks['conflicting_duplicate'].tolist(), [False, False, True, True])
+        self.assertEqual(invalid_row_indexes(validate_rows(rows)), {2, 3})
+
+    def test_year_column_separates_seasons(self):
+        masks = run_checks([
+            csv_row(Year='2023'),
+            csv_row(Year='2024', current='13', change='3', year_over_year='8'),
+        ])
+
+        self.assertFalse(masks['duplicate_row'].any())
+        self.assertFalse(masks['conflicting_duplicate'].any())
+
+
+def write_csv(path, rows):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+class SnapshotTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.snapshot = Path(directory.name) / 'surveillance.sqlite3'
+        self.snapshot.touch()
+        patcher = mock.patch.dict(settings.DATABASES[snapshots.SNAPSHOT_DB_ALIAS], NAME=self.snapshot)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(SERVE_FROM_SNAPSHOT=True)
+    def test_reads_the_snapshot_when_one_is_published(self):
+        self.assertEqual(snapshots.read_alias(), snapshots.SNAPSHOT_DB_ALIAS)
+
+    @override_settings(SERVE_FROM_SNAPSHOT=True)
+    def test_other_databases_are_read_directly(self):
+        with mock.patch.dict(settings.DATABASES['default'], ENGINE='django.db.backends.postgresql'):
+            self.assertIsNone(snapshots.publish_snapshot())
+            self.assertEqual(snapshots.read_alias(), 'default')
+
+
+class YearDetectionTests(SimpleTestCase):
+
+    def test_file_name_wins_over_directories(self):
+        self.assertEqual(detect_year('archive/2019/ewars_2020_w17.csv', root='archive'), 2020)
+        self.assertEqual(detect_year('archive/2019/17.csv', root='archive'), 2019)
+
+    def test_directories_above_root_are_ignored(self):
+        self.assertEqual(detect_year('backup-2021/archive/week/17.csv', root='backup-2021/archive'), None)
+        self.assertEqual(detect_year('backup-2021/archive/week/17.csv', root='backup-2021'), 2021)
+        # Without a root only the immediate parent is checked
+        self.assertEqual(detect_year('2021/week/17.csv'), None)
+        self.assertEqual(detect_year('2021/17.csv'), 2021)
+
+    def test_numbers_that_are_not_years_are_ignored(self):
+        self.assertEqual(detect_year('bulletin_120245.csv'), None)
+        self.assertEqual(detect_year('week_17.csv'), None)
+
+    def test_year_column_wins_over_the_default(self):
+        self.assertEqual(row_year({'Year': ' 2018 '}, 2019), 2018)
+        self.assertEqual(row_year({'Year': ''}, 2019), 2019)
+        self.assertEqual(row_year({'Year': 'n/a'}, 2019), 2019)
+        self.assertEqual(row_year({}, None), None)
+
+
+@mock.patch('surveillance.management.commands.import_surveillance_data.publish_snapshot')
+class ImportCommandTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+
+    def run_import(self, path, **options):
+        output = io.StringIO()
+        call_command('import_surveillance_data', file=str(path), stdout=output, **options)
+        return output.getvalue()
+
+    def test_clear_keeps_data_when_a_year_is_unknown(self, publish_snapshot):
+        self.run_import(write_csv(self.root / '2023' / '1.csv', [csv_row(week='1')]))
+        self.assertEqual(WeeklySurveillanceData.objects.count(), 1)
+
+        output = self.run_import(write_csv(self.root / 'undated' / '2.csv', [csv_row(week='2')]), clear=True)
+
+        self.assertIn('Cannot tell the year', output)
+        self.assertEqual(list(WeeklySurveillanceData.objects.values_list('year', 'week_number')), [(2023, 1)])
+
+    def test_import_without_sqlite_skips_the_snapshot(self, publish_snapshot):
+        publish_snapshot.side_effect = snapshots.publish_snapshot
+        with mock.patch.dict(settings.DATABASES['default'], ENGINE='django.db.backends.postgresql'):
+            output = self.run_import(write_csv(self.root / '2024' / '17.csv', [csv_row()]))
+
+        self.assertIn('Successfully imported 1 rows', output)
+        self.assertNotIn('Error', output)
+        self.assertEqual(list(Job.objects.values_list('task', flat=True)), ['refit_forecasts'])
+
+    def test_jobs_are_queued_when_publishing_fails(self, publish_snapshot):
+        publish_snapshot.side_effect = OSError('No space left on device')
+        output = self.run_import(write_csv(self.root / '2024' / '17.csv', [csv_row()]))
+
+        self.assertIn('publishing the read snapshot failed', output)
+        self.assertEqual(WeeklySurveillanceData.objects.count(), 1)
+        self.assertEqual(list(Job.objects.values_list('task', flat=True)), ['refit_forecasts'])
+
+    def test_year_option_is_only_a_fallback(self, publish_snapshot):
+        write_csv(self.root / 'archive' / '2019' / '17.csv', [csv_row(week='17')])
+        write_csv(self.root / 'archive' / 'undated' / '18.csv', [
+            csv_row(week='18', Year=''), csv_row(week='19', Year='2018'),
+        ])
+        self.run_import(self.root / 'archive', year=2024)
+
+        self.assertEqual(
+            sorted(WeeklySurveillanceData.objects.values_list('year', 'week_number')),
+            [(2018, 19), (2019, 17), (2024, 18)],
+        )
+
+    def test_conflicts_between_files_are_detected(self, publish_snapshot):
+        write_csv(self.root / 'archive' / '2024' / '17.csv', [csv_row()])
+        write_csv(self.root / 'archive' / '2024' / '17-republished.csv', [
+            csv_row(current='13', change='3', year_over_year='8'),
+        ])
+        # The same week of another season is not a duplicate
+        write_csv(self.root / 'archive' / '2023' / '17.csv', [csv_row()])
+        output = self.run_import(self.root / 'archive', quarantine=True)
+
+        self.assertIn('conflicting_duplicate: 1 rows', output)
+        self.assertEqual(
+            sorted(QuarantinedRow.objects.values_list('source_file', flat=True)),
+            [str(self.root / 'archive' / '2024' / name) for name in ['17-republished.csv', '17.csv']],
+        )
+        self.assertEqual(list(WeeklySurveillanceData.objects.values_list('year', flat=True)), [2023])
+
+    def test_quarantine_holds_back_rows_with_errors(self, publish_snapshot):
+        path = write_csv(self.root / '2024' / '17.csv', [
+            csv_row(disease='Dengue'),
+            csv_row(disease='Malaria', change='3'),
+            csv_row(disease='Typhoid', current='', change='', year_over_year=''),
+        ])
+        self.run_import(path, quarantine=True)
+
+        self.assertEqual(
+            sorted(WeeklySurveillanceData.objects.values_list('disease__name', flat=True)),
+            ['Dengue', 'Typhoid'],
+        )
+        quarantined = QuarantinedRow.objects.get()
+        self.assertEqual(quarantined.line_number, 3)
+        self.assertEqual(quarantined.data['Disease_Syndrome'], 'Malaria')
+        self.assertEqual(quarantined.errors, ['change_mismatch'])
+
+    def test_history_survives_revisions_and_clear(self, publish_snapshot):
+        def state(when, **filters):
+            return [
+                (record['disease_id'], record['current_week_cases'], [case['cases'] for case in record['district_cases']])
+                for record in surveillance_as_of(when, **filters)
+            ]
+
+        before_import = timezone.now()
+        self.run_import(write_csv(self.root / '2024' / '17.csv', [csv_row(current='12')]))
+        dengue = Disease.objects.get(name='Dengue')
+        first_import = timezone.now()
+
+        # EWARS revises the week
+        self.run_import(write_csv(self.root / '2024' / '17.csv', [
+            csv_row(current='15', change='5', year_over_year='10', districts='KATHMANDU (6)'),
+        ]))
+        revised = timezone.now()
+
+        self.run_import(write_csv(self.root / '2024' / '17.csv', [csv_row(disease='Malaria')]), clear=True)
+        malaria = Disease.objects.get(name='Malaria')
+
+        self.assertEqual(state(before_import), [])
+        self.assertEqual(state(first_import), [(dengue.id, 12, [4])])
+        self.assertEqual(state(revised), [(dengue.id, 15, [6])])
+        self.assertEqual(state(timezone.now()), [(malaria.id, 12, [4])])
+
+        # Filtered reconstruction still finds the cleared records
+        self.assertEqual(state(revised, year=2024, disease_id__in=[dengue.id]), [(dengue.id, 15, [6])])
+        self.assertEqual(state(revised, disease_id__in=[malaria.id]), [])
+        self.assertEqual(state(timezone.now(), week_number=17, disease_id__in=[dengue.id]), [])
+
+        # The same through the chunked scans used for long id lists
+        with mock.patch('surveillance.revisions.REVISION_BATCH_SIZE', 1):
+            self.assertEqual(state(revised, year=2024), [(dengue.id, 15, [6])])
+            self.assertEqual(state(timezone.now(), year=2024), [(malaria.id, 12, [4])])
+
+    def test_as_of_a_date_includes_that_whole_day(self, publish_snapshot):
+        def cases(date):
+            response = self.client.get('/api/v1/surveillance-data/as-of/', {'date': date})
+            self.assertEqual(response.status_code, 200)
+            return [record['current_week_cases'] for record in response.json()['results']]
+
+        self.run_import(write_csv(self.root / '2024' / '17.csv', [csv_row(current='12')]))
+        first_import = timezone.localtime().isoformat()
+        # A revision recorded later the same day
+        self.run_import(write_csv(self.root / '2024' / '17.csv', [
+            csv_row(current='15', change='5', year_over_year='10'),
+        ]))
+
+        today = timezone.localdate()
+        self.assertEqual(cases(today.isoformat()), [15])
+        self.assertEqual(cases(first_import), [12])
+        self.assertEqual(cases((today - timedelta(days=1)).isoformat()), [])
+        for date in ['2024-02-30', 'yesterday', '']:
+            with self.subTest(date=date):
+                response = self.client.get('/api/v1/surveillance-data/as-of/', {'date': date})
+                self.assertEqual(response.status_code, 400)
+
+
+class SaveRevisedBulkTests(TestCase):
+
+    def setUp(self):
+        self.dengue = Disease.objects.create(name='Dengue')
+
+    def save(self, *records):
+        return save_revised_bulk(SurveillanceRevision.KIND_WEEKLY, [
+            ((self.dengue.id, week, 2024), {'source_file': source_file, 'current_week_cases': cases}, source_file)
+            for week, cases, source_file in records
+        ])
+
+    def test_creates_updates_and_logs_changes(self):
+        ids, created, updated = self.save((1, 10, 'a.csv'), (2, 20, 'a.csv'), (2, 25, 'b.csv'))
+        self.assertEqual((created, updated), (2, 0))
+        # The last values given for a key win
+        self.assertEqual(WeeklySurveillanceData.objects.get(id=ids[(self.dengue.id, 2, 2024)]).current_week_cases, 25)
+
+        # Unchanged records are left alone; a changed source file alone is saved without a revision
+        _, created, updated = self.save((1, 10, 'a.csv'), (2, 25, 'c.csv'))
+        self.assertEqual((created, updated), (0, 1))
+        self.assertEqual(WeeklySurveillanceData.objects.get(week_number=2).source_file, 'c.csv')
+
+        _, created, updated = self.save((1, 12, 'd.csv'))
+        self.assertEqual((created, updated), (0, 1))
+
+        revisions = SurveillanceRevision.objects.order_by('id').values_list('object_id', 'action', 'previous')
+        self.assertEqual(list(revisions), [
+            (ids[(self.dengue.id, 1, 2024)], SurveillanceRevision.ACTION_CREATE, None),
+            (ids[(self.dengue.id, 2, 2024)], SurveillanceRevision.ACTION_CREATE, None),
+            (ids[(self.dengue.id, 1, 2024)], SurveillanceRevision.ACTION_UPDATE, {'current_week_cases': 10}),
+        ])
+
+
+class ForecastTests(TestCase):
+
+    def test_advance_week_handles_53_week_years(self):
+        self.assertEqual(advance_week(2020, 52, 1), (2020, 53))
+        self.assertEqual(advance_week(2020, 53, 1), (2021, 1))
+        self.assertEqual(advance_week(2024, 52, 1), (2025, 1))
+        # Week 53 reported in a 52-week year is still followed by week 1
+        self.assertEqual(advance_week(2024, 53, 2), (2025, 2))
+
+    def test_series_are_forecast_from_their_own_last_week(self):
+        dengue = Disease.objects.create(name='Dengue')
+        malaria = Disease.objects.create(name='Malaria')
+        kathmandu = District.objects.create(name='KATHMANDU')
+
+        for week in range(1, 6):
+            weekly = create_week(dengue, 2024, week, 10 * week)
+            if week <= 3:
+                DistrictCaseData.objects.create(surveillance_data=weekly, district=kathmandu, cases=week)
+        # Last reported seasons ago
+        for week in range(10, 15):
+            create_week(malaria, 2019, week, 5)
+
+        refit_forecasts()
+
+        def targets(**filters):
+            return list(CaseForecast.objects.filter(**filters).order_by('horizon').values_list('year', 'week_number'))
+
+        self.assertEqual(targets(disease=dengue, district=None), [(2024, 6), (2024, 7), (2024, 8), (2024, 9)])
+        self.assertEqual(targets(disease=dengue, district=kathmandu), [(2024, 4), (2024, 5), (2024, 6), (2024, 7)])
+        self.assertEqual(targets(disease=malaria), [])
+
+
+class ComputedMetricsTests(TestCase):
+
+    def setUp(self):
+        self.dengue = Disease.objects.create(name='Dengue')
+
+    def metrics(self, year, week):
+        return WeeklySurveillanceData.objects.filter(year=year, week_number=week).values(
+            'computed_previous_week_cases', 'computed_change_in_cases', 'computed_year_over_year_change',
+            'rolling_4_week_cases', 'growth_rate',
+        ).get()
+
+    def test_gaps_give_nulls(self):
+        for week, cases in [(16, 10), (17, 20), (18, 30), (19, 40), (21, 50), (22, 60), (23, 70), (24, 80)]:
+            create_week(self.dengue, 2024, week, cases)
+        refresh_computed_metrics()
+
+        self.assertEqual(self.metrics(2024, 19), {
+            'computed_previous_week_cases': 30,
+            'computed_change_in_cases': 10,
+            'computed_year_over_year_change': None,
+            'rolling_4_week_cases': 100,
+            'growth_rate': 0.3333,
+        })
+        # Week 20 is missing: no previous week, and no rolling sum until four weeks follow the gap
+        self.assertEqual(self.metrics(2024, 21)['computed_previous_week_cases'], None)
+        self.assertEqual(self.metrics(2024, 21)['computed_change_in_cases'], None)
+        self.assertEqual(self.metrics(2024, 23)['rolling_4_week_cases'], None)
+        self.assertEqual(self.metrics(2024, 24)['rolling_4_week_cases'], 260)
+        # Fewer than four weeks at the start of the series
+        self.assertEqual(self.metrics(2024, 18)['rolling_4_week_cases'], None)
+
+    def test_missing_counts_leave_the_rolling_sum_empty(self):
+        for week, cases in [(1, 10), (2, None), (3, 30), (4, 40), (5, 50)]:
+            create_week(self.dengue, 2024, week, cases)
+        refresh_computed_metrics()
+
+        self.assertEqual(self.metrics(2024, 4)['rolling_4_week_cases'], None)
+        self.assertEqual(self.metrics(2024, 5)['rolling_4_week_cases'], None)
+
+    def test_series_continue_across_years(self):
+        for year, week, cases in [(2023, 1, 5), (2023, 51, 10), (2023, 52, 20), (2024, 1, 30), (2024, 2, 40)]:
+            create_week(self.dengue, year, week, cases)
+        refresh_computed_metrics()
+
+        self.assertEqual(self.metrics(2024, 1)['computed_previous_week_cases'], 20)
+        self.assertEqual(self.metrics(2024, 1)['computed_year_over_year_change'], 25)
+        self.assertEqual(self.metrics(2024, 2)['rolling_4_week_cases'], 100)
+        self.assertEqual(self.metrics(2024, 2)['computed_year_over_year_change'], None)
+
+
+class HeatmapTests(TestCase):
+
+    def setUp(self):
+        dengue = Disease.objects.create(name='Dengue')
+        self.kathmandu = District.objects.create(name='KATHMANDU', geometry={
+            'type': 'Point', 'coordinates': [85.3, 27.7],
+        })
+        for year, week, cases in [(2023, 52, 300), (2024, 5, 20)]:
+            DistrictCaseData.objects.create(
+                surveillance_data=create_week(dengue, year, week, cases), district=self.kathmandu, cases=cases
+            )
+
+    def heatmap(self, **params):
+        return self.client.get('/api/v1/ewars/heatmap/', {'disease': 'dengue', **params})
+
+    def test_defaults_to_the_latest_year_and_week(self):
+        data = self.heatmap().json()
+        self.assertEqual((data['year'], data['week']), (2024, 5))
+        self.assertEqual(data['values'], [20])
+
+    def test_filters_on_year_and_week(self):
+        data = self.heatmap(year=2023).json()
+        self.assertEqual((data['year'], data['week'], data['values']), (2023, 52, [300]))
+        self.assertEqual(self.heatmap(week=52).json()['values'], [300])
+        self.assertEqual(self.heatmap(year=2024, week=52).status_code, 404)
+
+    def test_rejects_non_numeric_parameters(self):
+        self.assertEqual(self.heatmap(week='abc').status_code, 400)
+        self.assertEqual(self.heatmap(year='20x4').status_code, 400)
+
+    def test_requires_loaded_geometry(self):
+        District.objects.update(geometry=None)
+        response = self.heatmap()
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('load_district_geometries', response.json()['error'])
+
+    def test_loading_without_a_boundary_file_fails(self):
+        with self.assertRaises(CommandError):
+            call_command('load_district_geometries', file='/nonexistent/districts.geojson', stdout=io.StringIO())
+
+
+class DistrictGeometryLoadTests(TestCase):
+
+    def setUp(self):
+        for name in ['CHITAWAN', 'KAVREPALANCHOK', 'KATHMANDU', 'KASKI']:
+            District.objects.create(name=name, province='Unknown')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'districts.geojson'
+
+    def load(self, *names):
+        square = {'type': 'Polygon', 'coordinates': [[[85, 27], [85.1, 27], [85.1, 27.1], [85, 27.1], [85, 27]]]}
+        self.path.write_text(json.dumps({'type': 'FeatureCollection', 'features': [
+            {'type': 'Feature', 'properties': {'DISTRICT': name, 'PROVINCE': 'Bagmati'}, 'geometry': square}
+            for name in names
+        ]}))
+        output = io.StringIO()
+        call_command('load_district_geometries', file=str(self.path), stdout=output)
+        return output.getvalue()
+
+    def test_features_match_existing_districts_by_name_or_alias(self):
+        output = self.load('Chitwan', 'Kabhrepalanchok', 'kathmandu', 'Atlantis')
+
+        self.assertEqual(District.objects.count(), 4)
+        self.assertEqual(
+            sorted(District.objects.filter(geometry__isnull=False).values_list('name', 'province')),
+            [('CHITAWAN', 'Bagmati'), ('KATHMANDU', 'Bagmati'), ('KAVREPALANCHOK', 'Bagmati')],
+        )
+        self.assertIn('1 features match no district and were skipped (add their spelling to DISTRICT_ALIASES): Atlantis', output)
+        self.assertIn('No geometry for 1 districts: KASKI', output)
+
+    def test_fails_when_no_feature_matches(self):
+        with self.assertRaises(CommandError):
+            self.load('Atlantis')
+        self.assertEqual(District.objects.count(), 4)
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        for name in ['Dengue', 'Diarrhoea', 'Diphtheria']:
+            Disease.objects.create(name=name)
+
+    def search(self, **params):
+        return self.client.get('/api/v1/search/', {'q': 'd', **params})
+
+    def test_limit_caps_the_results(self):
+        response = self.search(limit=2)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_rejects_limits_out_of_range(self):
+        for limit in ['0', '-1', '51', 'ten']:
+            with self.subTest(limit=limit):
+                self.assertEqual(self.search(limit=limit).status_code, 400)
+
+
+class QueryTests(TestCase):
+
+    def setUp(self):
+        dengue = Disease.objects.create(name='Dengue')
+        malaria = Disease.objects.create(name='Malaria')
+        kathmandu = District.objects.create(name='KATHMANDU', province='Bagmati')
+        kaski = District.objects.create(name='KASKI', province='Gandaki')
+
+        for disease, week, cases, districts in [
+            (dengue, 1, 10, [(kathmandu, 6), (kaski, 3)]),
+            (dengue, 2, 20, [(kathmandu, 15)]),
+            (malaria, 1, 5, [(kaski, 4)]),
+        ]:
+            record = create_week(disease, 2024, week, cases, change_in_cases=cases - 1)
+            for district, district_cases in districts:
+                DistrictCaseData.objects.create(surveillance_data=record, district=district, cases=district_cases)
+
+    def query(self, **params):
+        return self.client.get('/api/v1/query/', params)
+
+    def test_rejects_malformed_parameters(self):
+        for params in [
+            {'group_by': 'continent'},
+            {'group_by': 'disease,disease'},
+            {'measures': 'median:cases'},
+            {'measures': 'sum:cases,sum:cases'},
+            {'week': 'first'},
+            {'cases_min': '1.5'},
+            {'limit': '0'},
+            {'limit': '1001'},
+            {'group_by': 'disease', 'order_by': 'district'},
+        ]:
+            with self.subTest(**params):
+                response = self.query(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_national_table_by_default(self):
+        data = self.query(group_by='disease', order_by='disease').json()
+
+        self.assertEqual(data['columns'], ['disease', 'sum_cases'])
+        self.assertEqual(data['rows'], [['Dengue', 30], ['Malaria', 5]])
+        self.assertFalse(data['truncated'])
+
+    def test_district_dimensions_use_the_district_table(self):
+        data = self.query(group_by='province', measures='sum:cases,max:cases', order_by='province').json()
+        self.assertEqual(data['rows'], [['Bagmati', 21, 15], ['Gandaki', 7, 4]])
+
+        data = self.query(group_by='week', district='kaski', order_by='week').json()
+        self.assertEqual(data['rows'], [[1, 7]])
+
+    def test_national_measures_are_not_available_per_district(self):
+        response = self.query(group_by='district', measures='sum:change')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Measure change is not available per district')
+
+    def test_orders_by_measures_and_dimensions(self):
+        by_cases = self.query(group_by='disease,week').json()
+        self.assertEqual(by_cases['rows'], [['Dengue', 2, 20], ['Dengue', 1, 10], ['Malaria', 1, 5]])
+
+        by_week = self.query(group_by='week,disease', order_by='-week').json()
+        self.assertEqual(by_week['rows'], [[2, 'Dengue', 20], [1, 'Dengue', 10], [1, 'Malaria', 5]])
+
+    def test_limit_marks_the_result_truncated(self):
+        data = self.query(group_by='disease,week', limit='2').json()
+
+        self.assertEqual(data['row_count'], 2)
+        self.assertTrue(data['truncated'])
+        self.assertFalse(self.query(group_by='disease,week', limit='3').json()['truncated'])
+
+    def test_without_group_by_aggregates_everything(self):
+        data = self.query(measures='sum:cases,avg:change', week_min='1', week_max='1').json()
+
+        self.assertEqual(data['columns'], ['sum_cases', 'avg_change'])
+        self.assertEqual(data['rows'], [[15, 6.5]])
+        self.assertFalse(data['truncated'])
+
+
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.failures = 0
+        for patcher in [mock.patch.dict(jobs.TASKS, {'flaky': self.flaky}), mock.patch.object(jobs, 'logger')]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def flaky(self, **payload):
+        self.calls.append(payload)
+        if len(self.calls) <= self.failures:
+            raise RuntimeError('still computing')
+
+    def test_claims_due_jobs_in_order(self):
+        later = jobs.enqueue('flaky', {'n': 2}, run_after=timezone.now() - timedelta(minutes=1))
+        first = jobs.enqueue('flaky', {'n': 1}, run_after=timezone.now() - timedelta(minutes=2))
+        jobs.enqueue('flaky', run_after=timezone.now() + timedelta(minutes=5))
+
+        claimed = [jobs.claim_next('worker-1'), jobs.claim_next('worker-2'), jobs.claim_next('worker-3')]
+
+        self.assertEqual([job.pk for job in claimed[:2]], [first.pk, later.pk])
+        self.assertIsNone(claimed[2])
+        self.assertEqual((claimed[0].status, claimed[0].worker, claimed[0].attempts), (Job.STATUS_RUNNING, 'worker-1', 1))
+
+    def test_failed_jobs_are_retried_with_backoff(self):
+        self.failures = 2
+        job = jobs.enqueue('flaky', max_attempts=3)
+
+        delays = []
+        for _ in range(3):
+            job = jobs.claim_next('worker')
+            started = timezone.now()
+            job = jobs.run_job(job)
+            if job.status == Job.STATUS_PENDING:
+                delays.append(round((job.run_after - started).total_seconds()))
+                Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+        self.assertEqual(delays, [jobs.RETRY_BACKOFF_SECONDS, 2 * jobs.RETRY_BACKOFF_SECONDS])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.last_error), (Job.STATUS_SUCCEEDED, 3, None))
+
+    def test_jobs_fail_after_max_attempts(self):
+        self.failures = 5
+        job = jobs.enqueue('flaky', max_attempts=2)
+        for _ in range(2):
+            jobs.run_job(jobs.claim_next('worker'))
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_FAILED, 2))
+        self.assertIn('still computing', job.last_error)
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(jobs.claim_next('worker'))
+
+    def test_stale_jobs_are_requeued_or_failed(self):
+        long_ago = timezone.now() - jobs.STALE_JOB_TIMEOUT - timedelta(minutes=1)
+        stale = jobs.enqueue('flaky')
+        exhausted = jobs.enqueue('flaky', max_attempts=1)
+        current = jobs.enqueue('flaky')
+        for job in [stale, exhausted, current]:
+            jobs.claim_next('crashed-worker')
+        Job.objects.filter(pk__in=[stale.pk, exhausted.pk]).update(started_at=long_ago)
+
+        self.assertEqual(jobs.requeue_stale_jobs(), 1)
+
+        statuses = dict(Job.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[stale.pk], Job.STATUS_PENDING)
+        self.assertEqual(statuses[exhausted.pk], Job.STATUS_FAILED)
+        self.assertEqual(statuses[current.pk], Job.STATUS_RUNNING)
+        self.assertIsNone(Job.objects.get(pk=stale.pk).worker)
+
+    @mock.patch('surveillance.jobs.SAVE_RETRY_SECONDS', 0)
+    def test_status_save_is_retried_while_the_database_is_locked(self):
+        jobs.enqueue('flaky')
+        job = jobs.claim_next('worker')
+
+        save = Job.save
+        attempts = []
+
+        def locked_once(instance, *args, **kwargs):
+            attempts.append(instance.pk)
+            if len(attempts) == 1:
+                raise OperationalError('database is locked')
+            return save(instance, *args, **kwargs)
+
+        with mock.patch.object(Job, 'save', locked_once):
+            jobs.run_job(job)
+
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.STATUS_SUCCEEDED)
+
+    def test_worker_survives_a_failed_status_update(self):
+        job = jobs.enqueue('flaky')
+        output = io.StringIO()
+        with mock.patch('surveillance.management.commands.run_jobs.claim_next', side_effect=[job, None]), \
+                mock.patch('surveillance.management.commands.run_jobs.run_job',
+                           side_effect=OperationalError('database is locked')):
+            call_command('run_jobs', once=True, stdout=output)
+
+        self.assertIn('could not record the outcome', output.getvalue())
+        self.assertIn('Job worker stopped', output.getvalue())
@@ -7,6 +7,7 @@ router = DefaultRouter()
 router.register(r'diseases', views.DiseaseViewSet)
 router.register(r'districts', views.DistrictViewSet)
 router.register(r'surveillance-data', views.WeeklySurveillanceDataViewSet)
+router.register(r'forecasts', views.CaseForecastViewSet)
 
 urlpatterns = [
     # ViewSet URLs
@@ -17,4 +18,8 @@ urlpatterns = [
     path('api/v1/ewars/disease-tracker/', views.disease_tracker, name='disease-tracker'),
     path('api/v1/ewars/outbreak-alerts/', views.outbreak_alerts, name='outbreak-alerts'),
     path('api/v1/ewars/safety-tips/', views.safety_tips, name='safety-tips'),
+    path('api/v1/ewars/heatmap/', views.disease_heatmap, name='disease-heatmap'),
+    path('api/v1/search/', views.search_suggestions, name='search'),
+    path('api/v1/query/', views.surveillance_query, name='surveillance-query'),
+    path('api/v1/geo/districts/', views.district_geometry, name='district-geometry'),
 ]
@@ -0,0 +1,206 @@
+"""
+Data-quality checks for EWARS surveillance CSV files.
+
+All rows of a file are checked together with vectorized NumPy operations and
+the result is a JSON-serializable report. Checks are either errors (the row
+should not be trusted, e.g. a delta that does not match its counts) or
+warnings (worth reviewing, but common in genuine bulletins, e.g. syndromes
+reported without national counts).
+"""
+import re
+
+import numpy as np
+
+# Model field -> CSV column for the numeric case columns
+NUMERIC_COLUMNS = {
+    'previous_week_cases': 'Previous_Week_Cases',
+    'current_week_cases': 'Current_Week_Cases',
+    'change_in_cases': 'Change_in_Cases',
+    'same_week_last_year': 'Same_Week_Last_Year',
+    'year_over_year_change': 'Year_over_Year_Change',
+}
+
+DISTRICT_CASES_PATTERN = re.compile(r'\(([0-9]{1,15})\)')
+
+# Optional minus sign and ASCII digits; the length cap keeps values exact as floats
+INTEGER_PATTERN = re.compile(r'-?[0-9]{1,15}')
+
+ERROR_CHECKS = [
+    'invalid_week',
+    'unparseable_number',
+    'negative_cases',
+    'change_mismatch',
+    'year_over_year_mismatch',
+    'conflicting_duplicate',
+]
+
+WARNING_CHECKS = [
+    'missing_case_counts',
+    'district_sum_exceeds_total',
+    'duplicate_row',
+]
+
+
+def _column(rows, name):
+    return np.array([(row.get(name) or '').strip() for row in rows], dtype=str)
+
+
+def _parse_integers(values):
+    """Parse a string array into floats (NaN when empty) and a mask of unparseable cells"""
+    empty = np.char.str_len(values) == 0
+    numeric = np.array([INTEGER_PATTERN.fullmatch(value) is not None for value in values.tolist()], dtype=bool)
+    parsed = np.full(values.shape, np.nan)
+    if numeric.any():
+        parsed[numeric] = values[numeric].astype(np.int64)
+    return parsed, ~empty & ~numeric
+
+
+def _mismatch(result, left, right):
+    """Rows where result != left - right, ignoring rows with any value missing"""
+    present = ~np.isnan(result) & ~np.isnan(left) & ~np.isnan(right)
+    with np.errstate(invalid='ignore'):
+        return present & (result != left - right)
+
+
+def _duplicates(keys, rows):
+    """Masks of rows sharing a key, and of those whose other values disagree"""
+    if not len(keys):
+        return np.zeros(0, dtype=bool), np.zeros(0, dtype=bool)
+
+    _, key_index, key_counts = np.unique(keys, return_inverse=True, return_counts=True)
+    duplicate = key_counts[key_index] > 1
+    conflicting = np.zeros(len(keys), dtype=bool)
+
+    # Only rows sharing a key are compared. Re-publishing a week under another
+    # file name is not a conflict; rows from files with different columns are
+    # compared over all of them
+    candidates = np.flatnonzero(duplicate)
+    if not len(candidates):
+        return duplicate, conflicting
+    columns = sorted({name for index in candidates for name in rows[index]} - {'Source_File', 'Year', None})
+    signatures = np.array([
+        '|'.join((rows[index].get(name) or '').strip() for name in columns) for index in candidates
+    ], dtype=str)
+
+    # Count distinct signatures per key
+    pairs = np.unique(np.stack([key_index[candidates].astype(str), signatures], axis=1), axis=0)
+    variants = np.bincount(pairs[:, 0].astype(np.intp), minlength=len(key_counts))
+    conflicting[candidates] = variants[key_index[candidates]] > 1
+    return duplicate, conflicting
+
+
+def run_checks(rows, years=None):
+    """
+    Evaluate every check over all rows; returns {check name: boolean mask}.
+
+    ``years`` gives each row's year when it is not (only) in a Year column,
+    e.g. when it comes from the file's path.
+    """
+    weeks, week_unparseable = _parse_integers(_column(rows, 'Week_Number'))
+
+    numbers = {}
+    unparseable = np.zeros(len(rows), dtype=bool)
+    for field, column in NUMERIC_COLUMNS.items():
+        numbers[field], bad = _parse_integers(_column(rows, column))
+        unparseable |= bad
+
+    counts = np.stack([
+        numbers['previous_week_cases'],
+        numbers['current_week_cases'],
+        numbers['same_week_last_year'],
+    ])
+    current = numbers['current_week_cases']
+
+    district_totals = np.array([
+        sum(int(cases) for cases in DISTRICT_CASES_PATTERN.findall(row.get('Top_Affected_Districts') or ''))
+        for row in rows
+    ], dtype=float)
+
+    # Rows of different seasons are told apart by their year
+    year_column = _column(rows, 'Year') if years is None else np.array(
+        ['' if year is None else str(year) for year in years], dtype=str
+    )
+    keys = np.char.add(np.char.add(year_column, '|'), _column(rows, 'Week_Number'))
+    keys = np.char.add(np.char.add(keys, '|'), _column(rows, 'Disease_Syndrome'))
+    duplicate, conflicting = _duplicates(keys, rows)
+
+    with np.errstate(invalid='ignore'):
+        return {
+            'invalid_week': week_unparseable | np.isnan(weeks) | (weeks < 1) | (weeks > 53),
+            'unparseable_number': unparseable,
+            'negative_cases': np.any(counts < 0, axis=0),
+            'change_mismatch': _mismatch(
+                numbers['change_in_cases'], current, numbers['previous_week_cases']
+            ),
+            'year_over_year_mismatch': _mismatch(
+                numbers['year_over_year_change'], current, numbers['same_week_last_year']
+            ),
+            'conflicting_duplicate': conflicting,
+            'missing_case_counts': np.isnan(current) & ~unparseable,
+            'district_sum_exceeds_total': ~np.isnan(current) & (district_totals > current),
+            'duplicate_row': duplicate & ~conflicting,
+        }
+
+
+def validate_rows(rows, source=None):
+    """
+    Check a whole file's rows and build the quality report.
+
+    ``issues`` lists every row with at least one failed check; ``row`` is the
+    0-based index into rows and ``line`` the line number in the CSV file.
+    """
+    rows = list(rows)
+    return _build_report(rows, run_checks(rows), source)
+
+
+def validate_files(files):
+    """
+    Check the rows of several files together and build a report per file.
+
+    ``files`` is a list of (source, rows, years) with each row's resolved
+    year, so a week imported from two files with different values is a
+    conflicting duplicate even when neither file has a Year column.
+    """
+    all_rows = [row for _, rows, _ in files for row in rows]
+    all_years = [year for _, _, years in files for year in years]
+    masks = run_checks(all_rows, all_years)
+
+    reports = []
+    start = 0
+    for source, rows, _ in files:
+        end = start + len(rows)
+        reports.append(_build_report(rows, {name: mask[start:end] for name, mask in masks.items()}, source))
+        start = end
+    return reports
+
+
+def _build_report(rows, masks, source):
+    errors = np.stack([masks[name] for name in ERROR_CHECKS]) if rows else np.zeros((0, 0), bool)
+    warnings = np.stack([masks[name] for name in WARNING_CHECKS]) if rows else np.zeros((0, 0), bool)
+
+    issues = []
+    flagged = np.flatnonzero(errors.any(axis=0) | warnings.any(axis=0)) if rows else []
+    for index in flagged:
+        issues.append({
+            'row': int(index),
+            'line': int(index) + 2,
+            'week': rows[index].get('Week_Number'),
+            'disease': rows[index].get('Disease_Syndrome'),
+            'errors': [name for name, failed in zip(ERROR_CHECKS, errors[:, index]) if failed],
+            'warnings': [name for name, failed in zip(WARNING_CHECKS, warnings[:, index]) if failed],
+        })
+
+    invalid_rows = sum(1 for issue in issues if issue['errors'])
+    return {
+        'source': source,
+        'total_rows': len(rows),
+        'valid_rows': len(rows) - invalid_rows,
+        'invalid_rows': invalid_rows,
+        'checks': {name: int(mask.sum()) for name, mask in masks.items()},
+        'issues': issues,
+    }
+
+
+def invalid_row_indexes(report):
+    """Indexes of rows that failed at least one error check"""
+    return {issue['row'] for issue in report['issues'] if issue['errors']}
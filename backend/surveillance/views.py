@@ -1,12 +1,23 @@
 from django.shortcuts import render
 from rest_framework import viewsets, status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
-from django.db.models import Sum, Count, Q, Max
-from .models import Disease, District, WeeklySurveillanceData, DistrictCaseData
+from django.db.models import Sum, Count, Q
+from django.db.models.functions import Coalesce
+from datetime import datetime, time
+from django.utils import timezone
+from django.utils.cache import parse_etags, patch_cache_control
+from django.utils.dateparse import parse_date, parse_datetime
+from .coalescing import coalesced
+from .geo import geometry_district_ids, geometry_payload, geometry_version
+from .query import QueryError, run_query
+from .revisions import surveillance_as_of
+from .search import DEFAULT_LIMIT, MAX_LIMIT, search
+from .snapshots import read_alias
+from .models import Disease, District, WeeklySurveillanceData, DistrictCaseData, CaseForecast
 from .serializers import (
     DiseaseSerializer, DistrictSerializer, WeeklySurveillanceDataSerializer,
-    DiseaseTrackerSerializer, NationalOverviewSerializer
+    DiseaseTrackerSerializer, NationalOverviewSerializer, CaseForecastSerializer
 )
 
 
@@ -47,23 +58,113 @@ class WeeklySurveillanceDataViewSet(viewsets.ReadOnlyModelViewSet):
             
         return queryset.order_by('-week_number', 'disease__name')
 
+    @action(detail=False, methods=['get'], url_path='as-of')
+    def as_of(self, request):
+        """Surveillance data as it was known at ?date= (YYYY-MM-DD or ISO datetime)"""
+        raw_date = request.query_params.get('date', '')
+        try:
+            # Checked first: parse_datetime() also accepts a plain date, as midnight
+            day = parse_date(raw_date)
+            if day is not None:
+                # A plain date means everything known by the end of that day
+                when = datetime.combine(day, time.max)
+            else:
+                when = parse_datetime(raw_date)
+        except ValueError:
+            when = None
+        if when is None:
+            return Response({
+                'error': 'The date parameter must be YYYY-MM-DD or an ISO datetime'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(when):
+            when = timezone.make_aware(when)
+
+        filters = {}
+        disease = request.query_params.get('disease')
+        if disease:
+            filters['disease_id__in'] = list(
+                Disease.objects.filter(name__icontains=disease).values_list('id', flat=True)
+            )
+        try:
+            week = request.query_params.get('week')
+            if week:
+                filters['week_number'] = int(week)
+            year = request.query_params.get('year')
+            if year:
+                filters['year'] = int(year)
+        except ValueError:
+            return Response({
+                'error': 'week and year must be integers'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        records = surveillance_as_of(when, **filters)
+
+        disease_names = dict(Disease.objects.values_list('id', 'name'))
+        district_names = dict(District.objects.values_list('id', 'name'))
+        for record in records:
+            record['disease'] = disease_names.get(record.pop('disease_id'))
+            for district_case in record['district_cases']:
+                district_case['district'] = district_names.get(district_case.pop('district_id'))
+
+        return Response({
+            'as_of': when,
+            'count': len(records),
+            'results': records,
+        })
+
+
+class CaseForecastViewSet(viewsets.ReadOnlyModelViewSet):
+    """ViewSet for CaseForecast model"""
+    queryset = CaseForecast.objects.select_related('disease', 'district')
+    serializer_class = CaseForecastSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        # Filter by disease
+        disease = self.request.query_params.get('disease')
+        if disease:
+            queryset = queryset.filter(disease__name__iexact=disease)
+
+        # Filter by district, or national=true for the national series only
+        district = self.request.query_params.get('district')
+        if district:
+            queryset = queryset.filter(district__name__iexact=district)
+        elif self.request.query_params.get('national') == 'true':
+            queryset = queryset.filter(district__isnull=True)
+
+        # Filter by horizon
+        horizon = self.request.query_params.get('horizon')
+        if horizon:
+            queryset = queryset.filter(horizon=horizon)
+
+        return queryset
+
+
+def latest_period(queryset):
+    """(year, week_number) of the most recent surveillance week, or None"""
+    return queryset.order_by('-year', '-week_number').values_list('year', 'week_number').first()
+
 
 @api_view(['GET'])
+@coalesced('national-overview')
 def national_overview(request):
     """API endpoint for national health overview"""
     try:
+        db = read_alias()
+
         # Get latest week data
-        latest_week = WeeklySurveillanceData.objects.aggregate(
-            max_week=Max('week_number')
-        )['max_week']
+        latest = latest_period(WeeklySurveillanceData.objects.using(db))
         
-        if not latest_week:
+        if not latest:
             return Response({
                 'error': 'No surveillance data available'
             }, status=status.HTTP_404_NOT_FOUND)
+
+        latest_year, latest_week = latest
         
-        latest_data = WeeklySurveillanceData.objects.filter(
-            week_number=latest_week
+        latest_data = WeeklySurveillanceData.objects.using(db).filter(
+            year=latest_year, week_number=latest_week
         ).select_related('disease')
         
         # Calculate statistics
@@ -84,7 +185,8 @@ def national_overview(request):
         ).count()
         
         # Get most affected districts
-        most_affected = DistrictCaseData.objects.filter(
+        most_affected = DistrictCaseData.objects.using(db).filter(
+            surveillance_data__year=latest_year,
             surveillance_data__week_number=latest_week
         ).values('district__name').annotate(
             total_cases=Sum('cases')
@@ -96,9 +198,11 @@ def national_overview(request):
         ]
         
         # Get recent outbreaks (diseases with significant increases)
-        recent_outbreaks = latest_data.filter(
-            Q(change_in_cases__gt=10) | Q(trend__icontains='large increase')
-        ).order_by('-change_in_cases')[:5]
+        recent_outbreaks = latest_data.annotate(
+            change=Coalesce('computed_change_in_cases', 'change_in_cases')
+        ).filter(
+            Q(change__gt=10) | Q(trend__icontains='large increase')
+        ).order_by('-change')[:5]
         
         response_data = {
             'total_cases': total_cases,
@@ -107,7 +211,8 @@ def national_overview(request):
             'trending_down': trending_down,
             'most_affected_districts': most_affected_districts,
             'recent_outbreaks': WeeklySurveillanceDataSerializer(recent_outbreaks, many=True).data,
-            'latest_week': latest_week
+            'latest_week': latest_week,
+            'latest_year': latest_year
         }
         
         return Response(response_data)
@@ -119,28 +224,32 @@ def national_overview(request):
 
 
 @api_view(['GET'])
+@coalesced('disease-tracker')
 def disease_tracker(request):
     """API endpoint for disease tracking dashboard"""
     try:
+        db = read_alias()
+
         # Get latest week data
-        latest_week = WeeklySurveillanceData.objects.aggregate(
-            max_week=Max('week_number')
-        )['max_week']
+        latest = latest_period(WeeklySurveillanceData.objects.using(db))
         
-        if not latest_week:
+        if not latest:
             return Response({
                 'error': 'No surveillance data available'
             }, status=status.HTTP_404_NOT_FOUND)
+
+        latest_year, latest_week = latest
         
         # Get disease data for latest week
-        disease_data = WeeklySurveillanceData.objects.filter(
-            week_number=latest_week
+        disease_data = WeeklySurveillanceData.objects.using(db).filter(
+            year=latest_year, week_number=latest_week
         ).select_related('disease').order_by('-current_week_cases')
         
         serializer = DiseaseTrackerSerializer(disease_data, many=True)
         
         return Response({
             'week_number': latest_week,
+            'year': latest_year,
             'diseases': serializer.data
         })
         
@@ -151,32 +260,38 @@ def disease_tracker(request):
 
 
 @api_view(['GET'])
+@coalesced('outbreak-alerts')
 def outbreak_alerts(request):
     """API endpoint for outbreak alerts"""
     try:
+        db = read_alias()
+
         # Get latest week data
-        latest_week = WeeklySurveillanceData.objects.aggregate(
-            max_week=Max('week_number')
-        )['max_week']
+        latest = latest_period(WeeklySurveillanceData.objects.using(db))
         
-        if not latest_week:
+        if not latest:
             return Response({
                 'error': 'No surveillance data available'
             }, status=status.HTTP_404_NOT_FOUND)
+
+        latest_year, latest_week = latest
         
         # Get alerts based on significant increases or concerning trends
-        alerts = WeeklySurveillanceData.objects.filter(
-            week_number=latest_week
+        # Prefer the change derived from the stored series over the CSV's own delta
+        alerts = WeeklySurveillanceData.objects.using(db).filter(
+            year=latest_year, week_number=latest_week
+        ).annotate(
+            change=Coalesce('computed_change_in_cases', 'change_in_cases')
         ).filter(
-            Q(change_in_cases__gt=20) |
+            Q(change__gt=20) |
             Q(trend__icontains='large increase') |
             Q(trend__icontains='significantly increasing') |
             Q(current_week_cases__gt=100)
-        ).select_related('disease').order_by('-change_in_cases')
+        ).select_related('disease').order_by('-change')
         
         alert_data = []
         for alert in alerts:
-            severity = 'high' if alert.change_in_cases and alert.change_in_cases > 50 else 'medium'
+            severity = 'high' if alert.change and alert.change > 50 else 'medium'
             if alert.current_week_cases and alert.current_week_cases > 200:
                 severity = 'high'
             
@@ -184,11 +299,13 @@ def outbreak_alerts(request):
                 'id': alert.id,
                 'disease': alert.disease.name,
                 'current_cases': alert.current_week_cases,
-                'change': alert.change_in_cases,
+                'change': alert.change,
+                'growth_rate': alert.growth_rate,
                 'trend': alert.trend,
                 'affected_areas': alert.top_affected_districts,
                 'severity': severity,
-                'week': alert.week_number
+                'week': alert.week_number,
+                'year': alert.year
             })
         
         return Response({
@@ -203,21 +320,25 @@ def outbreak_alerts(request):
 
 
 @api_view(['GET'])
+@coalesced('safety-tips')
 def safety_tips(request):
     """API endpoint for safety tips based on current outbreaks"""
     try:
+        db = read_alias()
+
         # Get latest week data
-        latest_week = WeeklySurveillanceData.objects.aggregate(
-            max_week=Max('week_number')
-        )['max_week']
+        latest = latest_period(WeeklySurveillanceData.objects.using(db))
         
-        if not latest_week:
+        if not latest:
             return Response({
                 'error': 'No surveillance data available'
             }, status=status.HTTP_404_NOT_FOUND)
+
+        latest_year, latest_week = latest
         
         # Get active diseases
-        active_diseases = WeeklySurveillanceData.objects.filter(
+        active_diseases = WeeklySurveillanceData.objects.using(db).filter(
+            year=latest_year,
             week_number=latest_week,
             current_week_cases__gt=0
         ).select_related('disease').order_by('-current_week_cases')
@@ -288,3 +409,152 @@ def safety_tips(request):
         return Response({
             'error': f'Error generating safety tips: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def etag_matches(header, etag):
+    """Weak If-None-Match comparison; compression middleware hands out W/ versions of our ETags"""
+    return any(tag == '*' or tag.removeprefix('W/') == etag for tag in parse_etags(header))
+
+
+@api_view(['GET'])
+def district_geometry(request):
+    """API endpoint for simplified district boundaries (long-lived cacheable)"""
+    try:
+        version = geometry_version()
+        if not geometry_district_ids(version):
+            return Response({
+                'error': 'No district geometry loaded; run manage.py load_district_geometries'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        etag = f'"{version}"'
+
+        if etag_matches(request.headers.get('If-None-Match', ''), etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(geometry_payload(version))
+
+        response['ETag'] = etag
+        # Clients request ?v=<version> (from the heatmap response) so the URL itself changes with the data
+        if request.query_params.get('v') == version:
+            patch_cache_control(response, public=True, max_age=60 * 60 * 24 * 365, immutable=True)
+        else:
+            patch_cache_control(response, public=True, max_age=60 * 60)
+        return response
+
+    except Exception as e:
+        return Response({
+            'error': f'Error generating district geometry: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+def disease_heatmap(request):
+    """API endpoint for per-district case values of a disease in a given week"""
+    try:
+        db = read_alias()
+
+        disease = request.query_params.get('disease')
+        if not disease:
+            return Response({
+                'error': 'The disease parameter is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        version = geometry_version()
+        district_ids = geometry_district_ids(version)
+        if not district_ids:
+            return Response({
+                'error': 'No district geometry loaded; run manage.py load_district_geometries'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            week = request.query_params.get('week')
+            week = int(week) if week else None
+            year = request.query_params.get('year')
+            year = int(year) if year else None
+        except ValueError:
+            return Response({
+                'error': 'week and year must be integers'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        surveillance = WeeklySurveillanceData.objects.using(db).filter(disease__name__iexact=disease)
+        if year:
+            surveillance = surveillance.filter(year=year)
+        if week:
+            surveillance = surveillance.filter(week_number=week)
+
+        # Default to the latest reported (year, week) matching the given parameters
+        latest = latest_period(surveillance)
+        if not latest:
+            return Response({
+                'error': 'No surveillance data available'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        year, week = latest
+        surveillance = surveillance.filter(year=year, week_number=week)
+
+        cases_by_district = dict(
+            DistrictCaseData.objects.using(db).filter(
+                surveillance_data__in=surveillance
+            ).values('district_id').annotate(
+                total_cases=Sum('cases')
+            ).values_list('district_id', 'total_cases')
+        )
+
+        return Response({
+            'disease': disease,
+            'week': week,
+            'year': year,
+            'geometry_version': version,
+            # Aligned with the features of the district geometry payload; null means not reported
+            'values': [cases_by_district.get(district_id) for district_id in district_ids],
+            'max_value': max(cases_by_district.values(), default=0),
+        })
+
+    except Exception as e:
+        return Response({
+            'error': f'Error generating disease heatmap: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+def surveillance_query(request):
+    """API endpoint for grouped aggregates over the surveillance data"""
+    try:
+        return Response(run_query(request.query_params, using=read_alias()))
+
+    except QueryError as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({
+            'error': f'Error running surveillance query: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+def search_suggestions(request):
+    """API endpoint for typeahead search over diseases, districts and provinces"""
+    try:
+        query = request.query_params.get('q', '')
+
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            limit = None
+        if limit is None or not 1 <= limit <= MAX_LIMIT:
+            return Response({
+                'error': f'limit must be an integer between 1 and {MAX_LIMIT}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        types = [item for item in request.query_params.get('type', '').split(',') if item]
+
+        return Response({
+            'query': query,
+            'results': search(query, limit=limit, types=types),
+        })
+
+    except Exception as e:
+        return Response({
+            'error': f'Error searching: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)